@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# Embedding layer in front of the sentence-transformer model.
+# Vectors are cached by a hash of the exact text in a bounded LRU, so a turn's
+# query embedding is reused by the memory insert and common phrases
+# ("hi", "thank you") skip the encoder entirely. Cache misses from concurrent
+# callers are coalesced by a MicroBatcher into one encoder call.
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class MicroBatcher:
+    """
+    Collects concurrent encode requests for up to max_wait_ms (or until
+    max_batch_size texts are queued), runs them as one batch on a worker
+    thread and resolves each caller's Future with its own slice.
+    """
+
+    def __init__(self, fn: Callable[[List[str]], List[List[float]]], max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.fn = fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self.batches = 0
+        self.texts = 0
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future: Future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            # Callers cancelled while queued (wrap_future cancels the Future)
+            # are skipped; the rest can no longer be cancelled from here on
+            pending = [(texts, future) for texts, future in pending if future.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+            try:
+                self._resolve(pending)
+            except Exception as e:  # never let one batch stop the worker
+                print(f"[EMBED] batch failed: {e!r}")
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _resolve(self, pending: List[tuple]) -> None:
+        batch = [t for texts, _ in pending for t in texts]
+        vectors = self.fn(batch)
+        self.batches += 1
+        self.texts += len(batch)
+        offset = 0
+        for texts, future in pending:
+            future.set_result(vectors[offset:offset + len(texts)])
+            offset += len(texts)
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+
+class EmbeddingService(Embeddings):
+    def __init__(self, model: Embeddings, max_entries: int = 4096, batcher: Optional[MicroBatcher] = None):
+        self.model = model
+        self.batcher = batcher
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: str):
+        vector = self._cache.get(key)
+        if vector is not None:
+            self._cache.move_to_end(key)
+        return vector
+
+    def _put(self, key: str, vector: List[float]) -> None:
+        self._cache[key] = vector
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _lookup(self, texts: List[str]):
+        """
+        Returns (results with cache hits filled in, {key: [indexes]} still missing).
+        """
+        results: List = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = _text_key(text)
+                vector = self._get(key)
+                if vector is not None:
+                    self.hits += 1
+                    results[i] = vector
+                else:
+                    self.misses += 1
+                    missing.setdefault(key, []).append(i)
+        return results, missing
+
+    def _fill(self, results: List, missing: Dict[str, List[int]], vectors: List[List[float]]) -> List[List[float]]:
+        with self._lock:
+            for key, vector in zip(missing, vectors):
+                self._put(key, vector)
+                for i in missing[key]:
+                    results[i] = vector
+        return results
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        if self.batcher is None:
+            return self.model.embed_documents(texts)
+        return self.batcher.submit(texts).result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        results, missing = self._lookup(texts)
+        if not missing:
+            return results
+        # Encode each distinct missing text once.
+        vectors = self._encode([texts[idx[0]] for idx in missing.values()])
+        return self._fill(results, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        results, missing = self._lookup(texts)
+        if not missing:
+            return results
+        pending = [texts[idx[0]] for idx in missing.values()]
+        if self.batcher is None:
+            vectors = await asyncio.to_thread(self.model.embed_documents, pending)
+        else:
+            # Wait on the batch without tying up a worker thread.
+            vectors = await asyncio.wrap_future(self.batcher.submit(pending))
+        return self._fill(results, missing, vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "batcher": self.batcher.stats() if self.batcher else None,
+            }
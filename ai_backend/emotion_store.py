@@ -0,0 +1,231 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+# Append-only per-user emotion time series.
+# Rows are keyed by (user_id, date, timestamp) so /emotion-graph is a single
+# indexed range scan instead of a vector search over conversation_memory.
+
+EMOTION_DB_PATH = os.getenv("EMOTION_DB_PATH", "./emotion_timeseries.db")
+
+# Rollup resolutions, finest first. Each bucket is identified by its ISO start time.
+RESOLUTIONS = ("minute", "hour", "day")
+
+_lock = threading.Lock()
+_conn = sqlite3.connect(EMOTION_DB_PATH, check_same_thread=False)
+_conn.execute("PRAGMA journal_mode=WAL")
+_conn.execute("PRAGMA synchronous=NORMAL")
+_conn.executescript(
+    """
+    CREATE TABLE IF NOT EXISTS emotion_points (
+        user_id   TEXT NOT NULL,
+        date      TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        emotion   TEXT NOT NULL,
+        intensity REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_emotion_points_user_date_ts
+        ON emotion_points (user_id, date, timestamp);
+
+    -- One row per (bucket, emotion); bucket stats are re-aggregated over emotions
+    -- at read time, so each sample is a single upsert per resolution.
+    CREATE TABLE IF NOT EXISTS emotion_rollups (
+        user_id       TEXT NOT NULL,
+        resolution    TEXT NOT NULL,
+        bucket        TEXT NOT NULL,
+        date          TEXT NOT NULL,
+        emotion       TEXT NOT NULL,
+        count         INTEGER NOT NULL,
+        sum_intensity REAL NOT NULL,
+        min_intensity REAL NOT NULL,
+        max_intensity REAL NOT NULL,
+        PRIMARY KEY (user_id, resolution, bucket, emotion)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_emotion_rollups_user_res_date
+        ON emotion_rollups (user_id, resolution, date);
+    """
+)
+_conn.commit()
+
+
+def _bucket_start(timestamp: str, resolution: str) -> str:
+    ts = datetime.fromisoformat(timestamp)
+    if resolution == "minute":
+        ts = ts.replace(second=0, microsecond=0)
+    elif resolution == "hour":
+        ts = ts.replace(minute=0, second=0, microsecond=0)
+    else:
+        ts = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.isoformat()
+
+
+def _fold_rollups(rows: List[Tuple[str, str, str, str, float]]) -> None:
+    """
+    Fold raw samples into every rollup resolution. Caller holds _lock.
+    """
+    _conn.executemany(
+        """
+        INSERT INTO emotion_rollups
+            (user_id, resolution, bucket, date, emotion, count, sum_intensity, min_intensity, max_intensity)
+        VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?)
+        ON CONFLICT (user_id, resolution, bucket, emotion) DO UPDATE SET
+            count = count + 1,
+            sum_intensity = sum_intensity + excluded.sum_intensity,
+            min_intensity = MIN(min_intensity, excluded.min_intensity),
+            max_intensity = MAX(max_intensity, excluded.max_intensity)
+        """,
+        [
+            (user_id, res, _bucket_start(ts, res), date, emotion, intensity, intensity, intensity)
+            for user_id, date, ts, emotion, intensity in rows
+            for res in RESOLUTIONS
+        ],
+    )
+
+
+def _write_rows(rows: List[Tuple[str, str, str, str, float]]) -> None:
+    """
+    Insert raw samples and update rollups in one transaction. Caller holds _lock.
+    """
+    _conn.executemany(
+        "INSERT INTO emotion_points (user_id, date, timestamp, emotion, intensity) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    _fold_rollups(rows)
+    _conn.commit()
+
+
+# Databases written before rollups existed: build them once from the raw points.
+if _conn.execute("SELECT 1 FROM emotion_rollups LIMIT 1").fetchone() is None:
+    _fold_rollups(_conn.execute(
+        "SELECT user_id, date, timestamp, emotion, intensity FROM emotion_points"
+    ).fetchall())
+    _conn.commit()
+
+
+def append_point(user_id: str, timestamp: str, emotion: str, intensity: float) -> None:
+    """
+    Append one emotion sample. timestamp is an ISO-8601 UTC string.
+    """
+    with _lock:
+        _write_rows([(user_id, timestamp[:10], timestamp, emotion, float(intensity))])
+
+
+def get_points(user_id: str, date: str) -> List[Dict]:
+    """
+    All samples for a user on one day (YYYY-MM-DD), oldest first.
+    """
+    with _lock:
+        rows = _conn.execute(
+            "SELECT emotion, intensity, timestamp FROM emotion_points "
+            "WHERE user_id = ? AND date = ? ORDER BY timestamp",
+            (user_id, date),
+        ).fetchall()
+    return [{"emotion": e, "intensity": i, "timestamp": ts} for e, i, ts in rows]
+
+
+def is_empty() -> bool:
+    with _lock:
+        return _conn.execute("SELECT 1 FROM emotion_points LIMIT 1").fetchone() is None
+
+
+def import_points(metadatas: Iterable[Dict]) -> int:
+    """
+    Bulk-load samples from existing memory metadata (one-off migration).
+    Entries without user_id/timestamp are skipped. Returns rows written.
+    """
+    rows = [
+        (
+            m["user_id"],
+            m.get("date") or m["timestamp"][:10],
+            m["timestamp"],
+            m.get("emotion") or "neutral",
+            float(m.get("intensity") or 0.0),
+        )
+        for m in metadatas
+        if m and m.get("user_id") and m.get("timestamp")
+    ]
+    if not rows:
+        return 0
+    with _lock:
+        _write_rows(rows)
+    return len(rows)
+
+
+def count_points(user_id: str, start_date: str, end_date: str, resolution: str = "raw") -> int:
+    """
+    Number of points a range query would return at the given resolution.
+    """
+    with _lock:
+        if resolution == "raw":
+            row = _conn.execute(
+                "SELECT COUNT(*) FROM emotion_points WHERE user_id = ? AND date BETWEEN ? AND ?",
+                (user_id, start_date, end_date),
+            ).fetchone()
+        else:
+            row = _conn.execute(
+                "SELECT COUNT(DISTINCT bucket) FROM emotion_rollups "
+                "WHERE user_id = ? AND resolution = ? AND date BETWEEN ? AND ?",
+                (user_id, resolution, start_date, end_date),
+            ).fetchone()
+    return row[0]
+
+
+def get_range(user_id: str, start_date: str, end_date: str, resolution: str = "raw") -> List[Dict]:
+    """
+    Points between two dates (inclusive, YYYY-MM-DD), oldest first.
+    raw returns individual samples; minute/hour/day return one aggregated
+    point per bucket with count, mean/min/max intensity and an emotion histogram.
+    """
+    if resolution == "raw":
+        with _lock:
+            rows = _conn.execute(
+                "SELECT emotion, intensity, timestamp FROM emotion_points "
+                "WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY timestamp",
+                (user_id, start_date, end_date),
+            ).fetchall()
+        return [{"emotion": e, "intensity": i, "timestamp": ts} for e, i, ts in rows]
+
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+
+    with _lock:
+        rows = _conn.execute(
+            "SELECT bucket, emotion, count, sum_intensity, min_intensity, max_intensity FROM emotion_rollups "
+            "WHERE user_id = ? AND resolution = ? AND date BETWEEN ? AND ? ORDER BY bucket",
+            (user_id, resolution, start_date, end_date),
+        ).fetchall()
+
+    points: List[Dict] = []
+    for bucket, emotion, count, total, lo, hi in rows:
+        if not points or points[-1]["timestamp"] != bucket:
+            points.append({
+                "timestamp": bucket,
+                "count": 0,
+                "intensity": 0.0,
+                "min_intensity": lo,
+                "max_intensity": hi,
+                "histogram": {},
+            })
+        p = points[-1]
+        p["count"] += count
+        p["intensity"] += total  # running sum, divided below
+        p["min_intensity"] = min(p["min_intensity"], lo)
+        p["max_intensity"] = max(p["max_intensity"], hi)
+        p["histogram"][emotion] = count
+
+    for p in points:
+        p["intensity"] = p["intensity"] / p["count"]
+        p["emotion"] = max(p["histogram"], key=p["histogram"].get)
+    return points
+
+
+def pick_resolution(user_id: str, start_date: str, end_date: str, max_points: int) -> str:
+    """
+    Most detailed resolution whose point count fits max_points (falls back to day).
+    """
+    for resolution in ("raw",) + RESOLUTIONS:
+        if count_points(user_id, start_date, end_date, resolution) <= max_points:
+            return resolution
+    return "day"
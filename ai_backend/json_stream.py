@@ -0,0 +1,172 @@
+import json
+from typing import Dict, List, Optional, Set
+
+# Incremental parser for the flat JSON object the LLM streams back.
+# Feed it raw text chunks as they arrive; it returns events as soon as
+# they can be known:
+#   {"type": "field", "key": k, "value": v}  once a value is complete
+#   {"type": "delta", "key": k, "text": t}   new characters of a string value
+#                                            whose key is in stream_keys
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class IncrementalJSONParser:
+    def __init__(self, stream_keys: Optional[Set[str]] = None):
+        self.stream_keys = stream_keys or set()
+        self.done = False
+        self._state = "start"
+        self._key: Optional[str] = None
+        self._buf: List[str] = []
+        self._esc: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._emitted = 0
+        # nested object/array values are captured raw and decoded at the end
+        self._depth = 0
+        self._nested_in_str = False
+        self._nested_esc = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        events: List[Dict] = []
+        for ch in chunk:
+            self._step(ch, events)
+        if self._state == "value_str" and self._key in self.stream_keys:
+            self._flush_delta(events)
+        return events
+
+    # -----------------------------
+    # State machine
+    # -----------------------------
+    def _step(self, ch: str, events: List[Dict]) -> None:
+        state = self._state
+
+        if state in ("key", "value_str"):
+            self._string_char(ch, events)
+            return
+
+        if state == "value_nested":
+            self._nested_char(ch, events)
+            return
+
+        if state == "value_scalar":
+            if ch in ",}" or ch.isspace():
+                self._end_value(json.loads("".join(self._buf)), events)
+                self._state = "after_value"
+                if not ch.isspace():
+                    self._step(ch, events)
+            else:
+                self._buf.append(ch)
+            return
+
+        if ch.isspace():
+            return
+
+        if state == "start":
+            if ch == "{":
+                self._state = "expect_key"
+        elif state == "expect_key":
+            if ch == '"':
+                self._begin_string("key")
+            elif ch == "}":
+                self._finish()
+        elif state == "after_key":
+            if ch == ":":
+                self._state = "expect_value"
+        elif state == "expect_value":
+            if ch == '"':
+                self._begin_string("value_str")
+            elif ch in "{[":
+                self._buf = [ch]
+                self._depth = 1
+                self._nested_in_str = False
+                self._nested_esc = False
+                self._state = "value_nested"
+            else:
+                self._buf = [ch]
+                self._state = "value_scalar"
+        elif state == "after_value":
+            if ch == ",":
+                self._state = "expect_key"
+            elif ch == "}":
+                self._finish()
+
+    def _begin_string(self, state: str) -> None:
+        self._buf = []
+        self._esc = None
+        self._high_surrogate = None
+        self._emitted = 0
+        self._state = state
+
+    def _string_char(self, ch: str, events: List[Dict]) -> None:
+        if self._esc is not None:
+            self._esc += ch
+            if self._esc[0] == "u":
+                if len(self._esc) < 5:
+                    return
+                self._append_codepoint(int(self._esc[1:], 16))
+            else:
+                self._buf.append(_ESCAPES.get(ch, ch))
+            self._esc = None
+            return
+
+        if ch == "\\":
+            self._esc = ""
+            return
+
+        if ch == '"':
+            text = "".join(self._buf)
+            if self._state == "key":
+                self._key = text
+                self._state = "after_key"
+            else:
+                if self._key in self.stream_keys:
+                    self._flush_delta(events)
+                self._end_value(text, events)
+                self._state = "after_value"
+            return
+
+        self._buf.append(ch)
+
+    def _append_codepoint(self, code: int) -> None:
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._buf.append(chr(code))
+
+    def _nested_char(self, ch: str, events: List[Dict]) -> None:
+        self._buf.append(ch)
+        if self._nested_in_str:
+            if self._nested_esc:
+                self._nested_esc = False
+            elif ch == "\\":
+                self._nested_esc = True
+            elif ch == '"':
+                self._nested_in_str = False
+            return
+        if ch == '"':
+            self._nested_in_str = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self._end_value(json.loads("".join(self._buf)), events)
+                self._state = "after_value"
+
+    def _flush_delta(self, events: List[Dict]) -> None:
+        text = "".join(self._buf)
+        if len(text) > self._emitted:
+            events.append({"type": "delta", "key": self._key, "text": text[self._emitted:]})
+            self._emitted = len(text)
+
+    def _end_value(self, value, events: List[Dict]) -> None:
+        events.append({"type": "field", "key": self._key, "value": value})
+        self._buf = []
+        self._key = None
+
+    def _finish(self) -> None:
+        self._state = "done"
+        self.done = True
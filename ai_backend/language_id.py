@@ -0,0 +1,277 @@
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Tuple
+
+# In-process language identification for reply().
+# Step 1 picks the dominant Unicode script. Scripts used by a single language
+# answer directly; Latin and Devanagari text is scored against small character
+# trigram profiles so Hindi/Marathi and English/Hinglish can be told apart.
+
+MIN_CONFIDENCE = float(os.getenv("LANG_ID_MIN_CONFIDENCE", "0.75"))
+
+# Trigrams needed before the n-gram score is trusted at full weight.
+# "hi" or "ok" never reach it, so they lean on the sticky cache instead.
+MIN_EVIDENCE = 12
+
+STICKY_MAX_USERS = 10_000
+
+# (first codepoint, last codepoint, script)
+_SCRIPT_RANGES = [
+    (0x0041, 0x005A, "Latin"), (0x0061, 0x007A, "Latin"), (0x00C0, 0x024F, "Latin"),
+    (0x0370, 0x03FF, "Greek"),
+    (0x0400, 0x04FF, "Cyrillic"),
+    (0x0590, 0x05FF, "Hebrew"),
+    (0x0600, 0x06FF, "Arabic"),
+    (0x0900, 0x097F, "Devanagari"),
+    (0x0980, 0x09FF, "Bengali"),
+    (0x0A00, 0x0A7F, "Gurmukhi"),
+    (0x0A80, 0x0AFF, "Gujarati"),
+    (0x0B00, 0x0B7F, "Oriya"),
+    (0x0B80, 0x0BFF, "Tamil"),
+    (0x0C00, 0x0C7F, "Telugu"),
+    (0x0C80, 0x0CFF, "Kannada"),
+    (0x0D00, 0x0D7F, "Malayalam"),
+    (0x0E00, 0x0E7F, "Thai"),
+    (0x1100, 0x11FF, "Hangul"),
+    (0x3040, 0x309F, "Kana"), (0x30A0, 0x30FF, "Kana"),
+    (0x4E00, 0x9FFF, "Han"),
+    (0xAC00, 0xD7AF, "Hangul"),
+]
+
+# Scripts that identify the language on their own.
+_SCRIPT_LANGUAGE = {
+    "Greek": "Greek",
+    "Cyrillic": "Russian",
+    "Hebrew": "Hebrew",
+    "Arabic": "Arabic",
+    "Bengali": "Bengali",
+    "Gurmukhi": "Punjabi",
+    "Gujarati": "Gujarati",
+    "Oriya": "Odia",
+    "Tamil": "Tamil",
+    "Telugu": "Telugu",
+    "Kannada": "Kannada",
+    "Malayalam": "Malayalam",
+    "Thai": "Thai",
+    "Hangul": "Korean",
+    "Kana": "Japanese",
+    "Han": "Chinese",
+}
+
+# Letters Urdu adds on top of the Arabic alphabet.
+_URDU_LETTERS = set("ٹڈڑںےہھ")
+
+# Seed text for the trigram profiles: short, conversational, same topics per language.
+_SEED_TEXT = {
+    "Devanagari": {
+        "Hindi": """
+            मैं आज बहुत खुश हूँ क्योंकि मेरा काम पूरा हो गया है।
+            आप कैसे हैं? क्या आप मेरी मदद कर सकते हैं?
+            मुझे नहीं पता कि मैं क्या करूँ, मैं बहुत परेशान हूँ।
+            यह बात सच है कि हम सब को मेहनत करनी चाहिए।
+            कल मैं अपने दोस्तों के साथ बाज़ार गया था।
+            मुझे एक कहानी सुनाइए जो बच्चों के लिए अच्छी हो।
+            आज मौसम बहुत अच्छा है और मैं घूमने जाना चाहता हूँ।
+            मेरी परीक्षा अगले हफ्ते है और मुझे डर लग रहा है।
+            क्या तुम मुझे समझा सकते हो कि यह कैसे काम करता है?
+            धन्यवाद, आपसे बात करके अच्छा लगा। क्या हाल है, सब ठीक है ना?
+            मेरा मूड खराब है, कुछ अच्छा बोलो। मुझे नींद नहीं आ रही है।
+        """,
+        "Marathi": """
+            मी आज खूप आनंदी आहे कारण माझे काम पूर्ण झाले आहे.
+            तुम्ही कसे आहात? तुम्ही मला मदत करू शकता का?
+            मला माहित नाही की मी काय करू, मी खूप त्रस्त आहे.
+            हे खरे आहे की आपण सगळ्यांनी मेहनत केली पाहिजे.
+            काल मी माझ्या मित्रांसोबत बाजारात गेलो होतो.
+            मला एक गोष्ट सांगा जी मुलांसाठी चांगली असेल.
+            आज हवामान खूप छान आहे आणि मला फिरायला जायचे आहे.
+            माझी परीक्षा पुढच्या आठवड्यात आहे आणि मला भीती वाटते.
+            तू मला हे समजावून सांगशील का की हे कसे चालते?
+            धन्यवाद, तुमच्याशी बोलून छान वाटले. काय चालले आहे, सगळं ठीक आहे ना?
+            माझा मूड खराब आहे, काहीतरी चांगलं बोल. मला झोप येत नाहीये.
+        """,
+    },
+    "Latin": {
+        "English": """
+            I am very happy today because my work is finally done.
+            How are you? Can you help me with something?
+            I don't know what to do, I feel really stressed out.
+            It is true that we all have to work hard.
+            Yesterday I went to the market with my friends.
+            Tell me a story that would be good for children.
+            The weather is really nice today and I want to go for a walk.
+            My exam is next week and I am scared about it.
+            Can you explain to me how this thing works?
+            Thank you, it was nice talking to you. What's up, is everything okay?
+            I'm in a bad mood, please say something nice. I can't sleep tonight.
+        """,
+        "Hinglish": """
+            main aaj bahut khush hoon kyunki mera kaam pura ho gaya hai.
+            aap kaise ho? kya aap meri madad kar sakte ho?
+            mujhe nahi pata main kya karun, main bahut pareshan hoon.
+            yaar ye baat sach hai ki hum sab ko mehnat karni chahiye.
+            kal main apne doston ke saath market gaya tha.
+            mujhe ek kahani sunao jo bachchon ke liye acchi ho.
+            aaj mausam bahut accha hai aur mera ghumne jaane ka mann hai.
+            meri exam agle hafte hai aur mujhe dar lag raha hai.
+            kya tum mujhe samjha sakte ho ki ye kaise kaam karta hai?
+            thank you, aapse baat karke accha laga. kya haal hai bhai, sab theek hai na?
+            mera mood kharab hai, kuch accha bolo na. mujhe neend nahi aa rahi hai.
+        """,
+        "Spanish": """
+            Estoy muy feliz hoy porque por fin terminé mi trabajo.
+            ¿Cómo estás? ¿Puedes ayudarme con algo?
+            No sé qué hacer, me siento muy estresado.
+            Es verdad que todos tenemos que trabajar duro.
+            Ayer fui al mercado con mis amigos.
+            Cuéntame una historia que sea buena para los niños.
+            Hoy hace muy buen tiempo y quiero salir a caminar.
+            Mi examen es la próxima semana y tengo miedo.
+            ¿Puedes explicarme cómo funciona esto?
+            Gracias, fue un placer hablar contigo. ¿Qué tal, todo bien?
+        """,
+        "French": """
+            Je suis très heureux aujourd'hui parce que mon travail est enfin terminé.
+            Comment ça va ? Est-ce que tu peux m'aider avec quelque chose ?
+            Je ne sais pas quoi faire, je suis vraiment stressé.
+            C'est vrai que nous devons tous travailler dur.
+            Hier je suis allé au marché avec mes amis.
+            Raconte-moi une histoire qui serait bien pour les enfants.
+            Il fait très beau aujourd'hui et je veux aller me promener.
+            Mon examen est la semaine prochaine et j'ai peur.
+            Peux-tu m'expliquer comment cela fonctionne ?
+            Merci, c'était agréable de parler avec toi. Quoi de neuf, tout va bien ?
+        """,
+        "German": """
+            Ich bin heute sehr glücklich, weil meine Arbeit endlich fertig ist.
+            Wie geht es dir? Kannst du mir bei etwas helfen?
+            Ich weiß nicht, was ich tun soll, ich bin wirklich gestresst.
+            Es stimmt, dass wir alle hart arbeiten müssen.
+            Gestern bin ich mit meinen Freunden auf den Markt gegangen.
+            Erzähl mir eine Geschichte, die gut für Kinder ist.
+            Das Wetter ist heute sehr schön und ich möchte spazieren gehen.
+            Meine Prüfung ist nächste Woche und ich habe Angst.
+            Kannst du mir erklären, wie das funktioniert?
+            Danke, es war schön, mit dir zu reden. Was gibt's, alles gut?
+        """,
+    },
+}
+
+# Devanagari vowel signs and virama are combining marks, not letters; without
+# them in the class every matra would split a word apart.
+_LETTER = r"(?:[^\W\d_]|[\u0900-\u0903\u093A-\u094F\u0962\u0963])"
+_WORD_RE = re.compile(rf"{_LETTER}+(?:['’]{_LETTER}+)?")
+
+
+def _script_of(ch: str) -> Optional[str]:
+    cp = ord(ch)
+    for lo, hi, script in _SCRIPT_RANGES:
+        if lo <= cp <= hi:
+            return script
+    return None
+
+
+def _trigrams(text: str) -> Counter:
+    grams: Counter = Counter()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            grams[padded[i:i + 3]] += 1
+    return grams
+
+
+def _build_profiles() -> Dict[str, Dict[str, Tuple[Dict[str, float], float]]]:
+    """
+    Per script group: language -> (trigram log-probs, log-prob of an unseen trigram).
+    Add-one smoothing over the union vocabulary of the group.
+    """
+    profiles = {}
+    for script, seeds in _SEED_TEXT.items():
+        counts = {lang: _trigrams(text) for lang, text in seeds.items()}
+        vocab = set().union(*counts.values())
+        group = {}
+        for lang, grams in counts.items():
+            denom = sum(grams.values()) + len(vocab) + 1
+            group[lang] = (
+                {g: math.log((c + 1) / denom) for g, c in grams.items()},
+                math.log(1 / denom),
+            )
+        profiles[script] = group
+    return profiles
+
+
+_PROFILES = _build_profiles()
+
+
+def _score_ngrams(text: str, script: str) -> Tuple[str, float]:
+    grams = _trigrams(text)
+    n = sum(grams.values())
+    group = _PROFILES[script]
+    if n == 0:
+        return next(iter(group)), 0.0
+
+    scores = {
+        lang: sum(c * logp.get(g, unseen) for g, c in grams.items())
+        for lang, (logp, unseen) in group.items()
+    }
+    best = max(scores, key=scores.get)
+    # Posterior of the best language, discounted when there is little text to go on.
+    z = sum(math.exp(s - scores[best]) for s in scores.values())
+    return best, (1.0 / z) * min(1.0, n / MIN_EVIDENCE)
+
+
+def identify(text: str) -> Tuple[str, float]:
+    """
+    Returns (language name, confidence in [0, 1]).
+    """
+    scripts: Counter = Counter()
+    for ch in text:
+        if ch.isalpha():
+            script = _script_of(ch)
+            if script:
+                scripts[script] += 1
+    if not scripts:
+        return "English", 0.0
+
+    # Japanese text mixes Kana and Han; any Kana means Japanese.
+    if scripts.get("Kana"):
+        scripts["Kana"] += scripts.pop("Han", 0)
+
+    script, count = scripts.most_common(1)[0]
+    share = count / sum(scripts.values())
+
+    if script in _PROFILES:
+        language, confidence = _score_ngrams(text, script)
+        return language, confidence * share
+
+    language = _SCRIPT_LANGUAGE[script]
+    if language == "Arabic" and any(ch in _URDU_LETTERS for ch in text):
+        language = "Urdu"
+    return language, share
+
+
+# -----------------------------
+# Sticky per-user language
+# -----------------------------
+_sticky: "OrderedDict[str, str]" = OrderedDict()
+_sticky_lock = threading.Lock()
+
+
+def remember(user_id: Optional[str], language: str) -> None:
+    if not user_id:
+        return
+    with _sticky_lock:
+        _sticky[user_id] = language
+        _sticky.move_to_end(user_id)
+        while len(_sticky) > STICKY_MAX_USERS:
+            _sticky.popitem(last=False)
+
+
+def sticky(user_id: Optional[str]) -> Optional[str]:
+    if not user_id:
+        return None
+    with _sticky_lock:
+        return _sticky.get(user_id)
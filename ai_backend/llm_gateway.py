@@ -0,0 +1,187 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple, Type
+
+from fastapi import HTTPException
+
+# Gateway in front of a rate-limited provider (Gemini; also reused for Groq STT).
+#   - at most max_in_flight calls run at once
+#   - at most max_queue callers wait for a slot; beyond that, calls fail fast
+#     with GatewayOverloaded (served as HTTP 503)
+#   - 429 and 5xx responses are retried with exponential backoff and full jitter
+#   - every call (retries included) must finish within its deadline
+
+
+class GatewayOverloaded(Exception):
+    pass
+
+
+class LLMDeadlineExceeded(Exception):
+    pass
+
+
+def _status_code(e: Exception) -> Optional[int]:
+    # google.genai.errors.APIError carries .code; httpx-style errors carry .status_code
+    for attr in ("code", "status_code"):
+        value = getattr(e, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _retryable(e: Exception) -> bool:
+    code = _status_code(e)
+    return code == 429 or (code is not None and 500 <= code < 600)
+
+
+def http_error(e: Exception) -> HTTPException:
+    """
+    Map gateway rejections to HTTP: overload -> 503 (retry shortly), deadline -> 504.
+    """
+    if isinstance(e, GatewayOverloaded):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return HTTPException(status_code=504, detail=str(e))
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        max_queue: int = 32,
+        deadline_seconds: float = 20.0,
+        max_retries: int = 3,
+        base_backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        name: str = "LLM",
+        retry_exceptions: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.name = name
+        # retried in addition to 429/5xx, e.g. connection resets
+        self.retry_exceptions = retry_exceptions
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.deadline_seconds = deadline_seconds
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.rejected = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.queue_wait_total_ms = 0.0
+        self.queue_wait_max_ms = 0.0
+
+    def check_capacity(self) -> None:
+        """
+        Raise GatewayOverloaded now if a new call would be rejected
+        (lets streaming endpoints answer 503 before the response starts).
+        """
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise GatewayOverloaded(f"{self.name} gateway queue is full")
+
+    @asynccontextmanager
+    async def _slot(self, deadline_at: float):
+        self.check_capacity()
+        start = time.monotonic()
+        if not self._slots.locked():
+            await self._slots.acquire()  # free slot: returns without yielding
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline_at - start))
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMDeadlineExceeded(f"timed out waiting for an {self.name} slot")
+            finally:
+                self.waiting -= 1
+        waited_ms = (time.monotonic() - start) * 1000.0
+        self.queue_wait_total_ms += waited_ms
+        self.queue_wait_max_ms = max(self.queue_wait_max_ms, waited_ms)
+
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    async def _attempts(self, fn, deadline_at: float, *args, **kwargs):
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                self.timeouts += 1
+                raise LLMDeadlineExceeded(f"{self.name} call deadline exceeded")
+            try:
+                return await asyncio.wait_for(fn(*args, **kwargs), remaining)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise LLMDeadlineExceeded(f"{self.name} call deadline exceeded")
+            except Exception as e:
+                retryable = _retryable(e) or isinstance(e, self.retry_exceptions)
+                if not retryable or attempt >= self.max_retries:
+                    self.errors += 1
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+                if time.monotonic() + delay >= deadline_at:
+                    self.errors += 1
+                    raise
+                attempt += 1
+                self.retries += 1
+                reason = _status_code(e) or type(e).__name__
+                print(f"[{self.name} GATEWAY] {reason} from provider, retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def call(self, fn, *args, deadline: Optional[float] = None, **kwargs):
+        """
+        await fn(*args, **kwargs) under the gateway's limits.
+        """
+        deadline_at = time.monotonic() + (deadline or self.deadline_seconds)
+        async with self._slot(deadline_at):
+            return await self._attempts(fn, deadline_at, *args, **kwargs)
+
+    async def stream(self, fn, *args, deadline: Optional[float] = None, **kwargs):
+        """
+        Async-iterate the stream returned by `await fn(...)`. Opening the stream
+        is retried like call(); the slot is held until the stream ends.
+        """
+        deadline_at = time.monotonic() + (deadline or self.deadline_seconds)
+        async with self._slot(deadline_at):
+            stream = await self._attempts(fn, deadline_at, *args, **kwargs)
+            it = stream.__aiter__()
+            while True:
+                remaining = deadline_at - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError
+                    chunk = await asyncio.wait_for(it.__anext__(), remaining)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise LLMDeadlineExceeded(f"{self.name} stream deadline exceeded")
+                yield chunk
+
+    def stats(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "queue_wait_avg_ms": self.queue_wait_total_ms / self.calls if self.calls else 0.0,
+            "queue_wait_max_ms": self.queue_wait_max_ms,
+        }
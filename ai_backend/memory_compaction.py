@@ -0,0 +1,207 @@
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Background compaction of conversation memory.
+# For each user, memories older than min_age_days are greedily clustered by
+# cosine similarity; every cluster of two or more is replaced by one summary
+# memory whose embedding is the cluster centroid and whose metadata keeps the
+# aggregated emotion/intensity. If a user is still above max_per_user the
+# similarity threshold is relaxed step by step (down to min_similarity).
+# The emotion graph reads the separate time-series store, so it is unaffected.
+
+SUMMARY_MAX_CHARS = 500
+
+
+def _cluster(vectors: np.ndarray, threshold: float) -> List[List[int]]:
+    """
+    Greedy single-pass clustering against running centroids.
+    vectors must be unit-normalised; returns lists of row indexes.
+    """
+    clusters: List[List[int]] = []
+    sums = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+    for i, v in enumerate(vectors):
+        if clusters:
+            centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+            scores = centroids @ v
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                clusters[best].append(i)
+                sums[best] += v
+                continue
+        clusters.append([i])
+        sums = np.vstack([sums, v[None, :]])
+    return clusters
+
+
+def _weight(record: Dict) -> int:
+    return int(record["metadata"].get("count") or 1)
+
+
+def _summarize(user_id: str, members: List[Dict], vectors: np.ndarray) -> Dict:
+    weights = np.array([_weight(m) for m in members], dtype=np.float32)
+    centroid = (vectors * weights[:, None]).sum(axis=0)
+    centroid /= np.linalg.norm(centroid) or 1.0
+
+    # Medoid first, then the other distinct texts until the size limit
+    order = np.argsort(-(vectors @ centroid))
+    parts, seen = [], set()
+    for idx in order:
+        text = members[idx]["text"].strip()
+        if text and text.lower() not in seen:
+            seen.add(text.lower())
+            parts.append(text)
+    summary = ""
+    for text in parts:
+        candidate = f"{summary}; {text}" if summary else text
+        if len(candidate) > SUMMARY_MAX_CHARS:
+            break
+        summary = candidate
+    if not summary and parts:
+        summary = parts[0][:SUMMARY_MAX_CHARS]
+
+    histogram: Counter = Counter()
+    for m in members:
+        sub = m["metadata"].get("emotion_histogram")
+        if sub:
+            histogram.update(json.loads(sub))
+        else:
+            histogram[m["metadata"].get("emotion") or "neutral"] += 1
+    intensity = float(sum(
+        float(m["metadata"].get("intensity") or 0.0) * w for m, w in zip(members, weights)
+    ) / weights.sum())
+    timestamps = sorted(
+        ts for m in members
+        for ts in (m["metadata"].get("first_timestamp"), m["metadata"].get("timestamp")) if ts
+    )
+
+    return {
+        "text": f"(summary of {int(weights.sum())} past messages) {summary}",
+        "embedding": centroid.tolist(),
+        "metadata": {
+            "user_id": user_id,
+            "summary": True,
+            "count": int(weights.sum()),
+            "emotion": histogram.most_common(1)[0][0],
+            "emotion_histogram": json.dumps(dict(histogram)),  # metadata values must be scalars
+            "intensity": intensity,
+            "first_timestamp": timestamps[0],
+            "timestamp": timestamps[-1],
+            "date": timestamps[-1][:10],
+        },
+    }
+
+
+def _search_ms(store, user_id: str, probe, repeats: int = 5) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        store.search(user_id, probe, 5)
+    return (time.perf_counter() - start) * 1000.0 / repeats
+
+
+def compact_user(
+    store,
+    user_id: str,
+    min_age_days: float = 30,
+    max_per_user: int = 2000,
+    similarity: float = 0.85,
+    min_similarity: float = 0.6,
+) -> Dict:
+    records = store.get_user(user_id)
+    before = len(records)
+    report = {"user_id": user_id, "before": before, "after": before, "clusters": 0}
+    if before < 2:
+        return report
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=min_age_days)).isoformat()
+    old = [r for r in records if (r["metadata"].get("timestamp") or "") < cutoff]
+    if len(old) < 2:
+        return report
+
+    probe = records[-1]["embedding"]
+    report["search_ms_before"] = _search_ms(store, user_id, probe)
+
+    vectors = np.asarray([r["embedding"] for r in old], dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    threshold = similarity
+    while True:
+        clusters = [c for c in _cluster(vectors, threshold) if len(c) > 1]
+        after = before - sum(len(c) - 1 for c in clusters)
+        if after <= max_per_user or threshold - 0.05 < min_similarity:
+            break
+        threshold -= 0.05
+
+    if not clusters:
+        report["search_ms_after"] = report["search_ms_before"]
+        return report
+
+    summaries = [_summarize(user_id, [old[i] for i in c], vectors[c]) for c in clusters]
+    # Add before delete: a failure in between duplicates memories rather than losing them
+    store.add(summaries)
+    store.delete(user_id, [old[i]["id"] for c in clusters for i in c])
+
+    report.update({
+        "after": store.count(user_id),
+        "clusters": len(clusters),
+        "similarity": round(threshold, 2),
+        "search_ms_after": _search_ms(store, user_id, probe),
+    })
+    return report
+
+
+class CompactionJob:
+    """
+    Runs compact_user for every user on a fixed interval in a daemon thread.
+    """
+
+    def __init__(self, store, interval_seconds: float, **options):
+        self.store = store
+        self.interval = interval_seconds
+        self.options = options
+        self.last_run: Optional[Dict] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="memory-compaction", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run()
+            except Exception as e:
+                print(f"[COMPACTION] run failed: {e}")
+
+    def run(self, user_ids: Optional[List[str]] = None) -> Dict:
+        with self._lock:
+            started = time.time()
+            reports = [
+                compact_user(self.store, user_id, **self.options)
+                for user_id in (user_ids or self.store.user_ids())
+            ]
+            changed = [r for r in reports if r["after"] != r["before"]]
+            self.last_run = {
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+                "duration_s": time.time() - started,
+                "users": len(reports),
+                "memories_before": sum(r["before"] for r in reports),
+                "memories_after": sum(r["after"] for r in reports),
+                "compacted_users": changed,
+            }
+            print(
+                f"[COMPACTION] {self.last_run['memories_before']} -> {self.last_run['memories_after']} "
+                f"memories across {len(reports)} users"
+            )
+            return self.last_run
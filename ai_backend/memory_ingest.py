@@ -0,0 +1,200 @@
+import json
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, List
+
+# Write-behind queue for conversation memory.
+# store_message only enqueues; a worker thread writes to the vector store in
+# batches once max_batch records are waiting or flush_interval has passed.
+# Records still queued at shutdown (or from a failed write) are appended to a
+# JSONL spill file and re-queued on the next start. Re-queued records are
+# kept in a replay file until every one of them has been written or spilled
+# again, so a crash during replay does not lose them.
+
+
+class MemoryIngestQueue:
+    def __init__(
+        self,
+        write_batch: Callable[[List[Dict]], None],
+        max_batch: int = 64,
+        flush_interval: float = 1.0,
+        spill_path: str = "./memory_spill.jsonl",
+    ):
+        self.write_batch = write_batch
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.replay_path = spill_path + ".replay"
+        self._queue: "queue.Queue[Dict]" = queue.Queue()
+        self._stop = threading.Event()
+        self._put_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._replay_pending = 0  # replayed records not yet written or re-spilled
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.flushes = 0
+        self.failed = 0
+        self.spilled = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+        self._load_spill()
+        self._worker = threading.Thread(target=self._run, name="memory-ingest", daemon=True)
+        self._worker.start()
+
+    def put(self, record: Dict) -> None:
+        """
+        record: {"text": str, "metadata": dict, "embedding": list | None}
+        Once closed, records go straight to the spill file.
+        """
+        with self._put_lock:
+            if not self._stop.is_set():
+                self.enqueued += 1
+                self._queue.put(record)
+                return
+        self._spill([record])
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    # -----------------------------
+    # Worker
+    # -----------------------------
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.2)))
+                except queue.Empty:
+                    continue
+            self._flush(batch)
+
+    def _flush(self, batch: List[Dict]) -> None:
+        start = time.perf_counter()
+        try:
+            self.write_batch(batch)
+        except Exception as e:
+            print(f"[MEMORY INGEST] batch of {len(batch)} failed, spilling to disk: {e}")
+            self.failed += len(batch)
+            self._spill(batch)
+            self._settle(len(batch))
+            return
+        ms = (time.perf_counter() - start) * 1000.0
+        self.flushes += 1
+        self.flushed += len(batch)
+        self.last_flush_ms = ms
+        self.max_flush_ms = max(self.max_flush_ms, ms)
+        self._total_flush_ms += ms
+        self._settle(len(batch))
+
+    # -----------------------------
+    # Spill file
+    # -----------------------------
+    def _spill(self, records: List[Dict]) -> None:
+        if not records:
+            return
+        with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.spilled += len(records)
+
+    def _read_spill(self, path: str) -> List[Dict]:
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError as e:  # e.g. a line cut short by a crash
+                    print(f"[MEMORY INGEST] skipping unreadable line {n} of {path}: {e}")
+        return records
+
+    def _load_spill(self) -> None:
+        """
+        Re-queue spilled records (and any replay left by a crash). They move to
+        the replay file first; the spill file is only removed once they are
+        safely there, and the replay file once they have all been settled.
+        """
+        records = []
+        for path in (self.replay_path, self.spill_path):
+            if os.path.exists(path):
+                records.extend(self._read_spill(path))
+        if os.path.exists(self.spill_path):
+            tmp = self.replay_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.replay_path)
+            os.remove(self.spill_path)
+        if not records:
+            if os.path.exists(self.replay_path):
+                os.remove(self.replay_path)
+            return
+        self._replay_pending = len(records)
+        for record in records:
+            self._queue.put(record)
+        print(f"[MEMORY INGEST] re-queued {len(records)} spilled records")
+
+    def _settle(self, n: int) -> None:
+        """
+        n records from the head of the queue were written or re-spilled. The
+        replayed records were queued first, so once that many are settled the
+        replay file is no longer needed.
+        """
+        if self._replay_pending <= 0:
+            return
+        self._replay_pending -= n
+        if self._replay_pending <= 0:
+            try:
+                os.remove(self.replay_path)
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        """
+        Stop the worker and spill whatever has not been written yet.
+        """
+        with self._put_lock:
+            if self._stop.is_set():
+                return
+            self._stop.set()
+        self._worker.join(timeout=5)
+        remaining = []
+        while True:
+            try:
+                remaining.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._spill(remaining)
+        self._settle(len(remaining))
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": self.depth(),
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "flushes": self.flushes,
+            "failed": self.failed,
+            "spilled": self.spilled,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": self._total_flush_ms / self.flushes if self.flushes else 0.0,
+            "max_flush_ms": self.max_flush_ms,
+        }
@@ -0,0 +1,99 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Picks which retrieved memories go into the prompt:
+#   1. drop candidates below a cosine similarity cutoff
+#   2. order the rest by maximal marginal relevance (relevant but not redundant),
+#      skipping near-duplicates of something already picked
+#   3. pack them into a hard token budget for the memory block
+
+CONTEXT_HEADER = "Relevant past conversation:\n"
+
+
+def approx_tokens(text: str) -> int:
+    # ~4 characters per token is close enough for budgeting and logs
+    return (len(text) + 3) // 4
+
+
+def format_context(texts: List[str]) -> str:
+    if not texts:
+        return ""
+    return CONTEXT_HEADER + "\n".join(f"- {t}" for t in texts)
+
+
+def _unit(vectors) -> np.ndarray:
+    v = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(v, axis=-1, keepdims=True)
+    return v / np.where(norms == 0, 1.0, norms)
+
+
+def select_memories(
+    candidates: List[Dict],
+    query_vector,
+    min_score: float = 0.35,
+    max_items: int = 5,
+    mmr_lambda: float = 0.7,
+    token_budget: int = 200,
+    duplicate_score: float = 0.92,
+    baseline_k: int = 5,
+) -> Tuple[List[str], Dict]:
+    """
+    candidates: search results with "text", "score" and "embedding", best first.
+    Returns (selected texts, report). The report compares the memory block
+    against the old behaviour of injecting the top baseline_k results.
+    """
+    baseline = format_context([c["text"] for c in candidates[:baseline_k]])
+    report = {
+        "candidates": len(candidates),
+        "below_cutoff": 0,
+        "redundant": 0,
+        "over_budget": 0,
+        "over_limit": 0,
+        "context_tokens": 0,
+        "baseline_tokens": approx_tokens(baseline) if baseline else 0,
+    }
+
+    seen = set()
+    relevant = []
+    for c in candidates:
+        if c["score"] < min_score:
+            report["below_cutoff"] += 1
+        elif c["text"] in seen:
+            report["redundant"] += 1
+        else:
+            seen.add(c["text"])
+            relevant.append(c)
+
+    selected: List[str] = []
+    if relevant:
+        docs = _unit([c["embedding"] for c in relevant])
+        relevance = docs @ _unit(query_vector)
+        chosen: List[int] = []
+        remaining = list(range(len(relevant)))
+        used = approx_tokens(CONTEXT_HEADER)
+        while remaining and len(chosen) < max_items:
+            if chosen:
+                redundancy = (docs[remaining] @ docs[chosen].T).max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+            mmr = mmr_lambda * relevance[remaining] - (1.0 - mmr_lambda) * redundancy
+            best = int(np.argmax(mmr))
+            pick = remaining.pop(best)
+            if redundancy[best] >= duplicate_score:
+                report["redundant"] += 1
+                continue
+            cost = approx_tokens(f"- {relevant[pick]['text']}\n")
+            if used + cost > token_budget:
+                report["over_budget"] += 1
+                continue
+            used += cost
+            chosen.append(pick)
+        # never examined: max_items was reached first
+        report["over_limit"] += len(remaining)
+        selected = [relevant[i]["text"] for i in chosen]
+
+    context = format_context(selected)
+    report["context_tokens"] = approx_tokens(context) if context else 0
+    report["tokens_saved"] = report["baseline_tokens"] - report["context_tokens"]
+    return selected, report
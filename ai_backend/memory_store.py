@@ -0,0 +1,333 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Conversation memory backends. Both expose the same small interface so
+# rag.py (and bench_memory_backends.py) can swap them:
+#   add(records)                 records: {"text", "metadata", "embedding"}
+#   search(user_id, vector, k, include_embeddings=False)
+#                                -> [{"id", "text", "metadata", "score"(, "embedding")}], best first
+#   metadatas()                  -> every stored metadata dict
+#   count(user_id=None)          -> number of stored memories
+#   user_ids()                   -> users with at least one memory
+#   get_user(user_id)            -> [{"id", "text", "metadata", "embedding"}]
+#   delete(user_id, ids)         -> remove memories by id
+# score is cosine similarity.
+
+
+def _record_vectors(records: List[Dict], embedding_fn) -> List[List[float]]:
+    """
+    Precomputed embeddings where present; the rest are encoded in one batch.
+    """
+    missing = [r["text"] for r in records if r.get("embedding") is None]
+    computed = iter(embedding_fn.embed_documents(missing)) if missing else iter(())
+    return [r["embedding"] if r.get("embedding") is not None else next(computed) for r in records]
+
+
+class ChromaMemoryStore:
+    """
+    One global Chroma collection filtered by user_id metadata.
+    """
+
+    def __init__(self, db, embedding_fn=None):
+        self.db = db
+        self.embedding_fn = embedding_fn
+        self._collection = db._collection
+
+    def add(self, records: List[Dict]) -> None:
+        if not records:
+            return
+        self._collection.add(
+            ids=[r.get("id") or uuid.uuid4().hex for r in records],
+            embeddings=_record_vectors(records, self.embedding_fn),
+            metadatas=[r["metadata"] for r in records],
+            documents=[r["text"] for r in records],
+        )
+
+    def search(self, user_id: str, vector, k: int = 5, include_embeddings: bool = False) -> List[Dict]:
+        include = ["documents", "metadatas", "distances"]
+        if include_embeddings:
+            include.append("embeddings")
+        res = self._collection.query(
+            query_embeddings=[list(vector)],
+            n_results=k,
+            where={"user_id": user_id},
+            include=include,
+        )
+        # Collection uses squared L2 on unit vectors: d = 2 - 2 cos
+        results = [
+            {"id": i, "text": doc, "metadata": meta, "score": 1.0 - dist / 2.0}
+            for i, doc, meta, dist in zip(
+                res["ids"][0], res["documents"][0], res["metadatas"][0], res["distances"][0]
+            )
+        ]
+        if include_embeddings:
+            for r, vec in zip(results, res["embeddings"][0]):
+                r["embedding"] = list(vec)
+        return results
+
+    def metadatas(self) -> Iterable[Dict]:
+        return self._collection.get(include=["metadatas"])["metadatas"]
+
+    def count(self, user_id: Optional[str] = None) -> int:
+        if user_id is None:
+            return self._collection.count()
+        return len(self._collection.get(where={"user_id": user_id}, include=[])["ids"])
+
+    def user_ids(self) -> List[str]:
+        return sorted({m["user_id"] for m in self.metadatas() if m and m.get("user_id")})
+
+    def get_user(self, user_id: str) -> List[Dict]:
+        res = self._collection.get(where={"user_id": user_id}, include=["documents", "metadatas", "embeddings"])
+        return [
+            {"id": i, "text": doc, "metadata": meta, "embedding": list(vec)}
+            for i, doc, meta, vec in zip(res["ids"], res["documents"], res["metadatas"], res["embeddings"])
+        ]
+
+    def delete(self, user_id: str, ids: List[str]) -> None:
+        if ids:
+            self._collection.delete(ids=list(ids))
+
+
+def _generation_files(path: str, generation: int):
+    # Generation 0 keeps the original file names, so existing stores load as-is
+    if generation == 0:
+        return os.path.join(path, "vectors.f16"), os.path.join(path, "meta.jsonl")
+    return os.path.join(path, f"vectors.{generation}.f16"), os.path.join(path, f"meta.{generation}.jsonl")
+
+
+def _current_generation(path: str) -> int:
+    try:
+        with open(os.path.join(path, "CURRENT"), encoding="utf-8") as f:
+            return int(f.read().strip())
+    except FileNotFoundError:
+        return 0
+
+
+def _meta_path(path: str) -> str:
+    return _generation_files(path, _current_generation(path))[1]
+
+
+class _UserMatrix:
+    """
+    One user's memories: a float16 (capacity, dim) memmap of unit vectors plus
+    a JSONL sidecar with id/text/metadata per row. Rows past `count` are unused.
+    A rewrite writes a new generation of both files; the CURRENT pointer file
+    names the live one and is replaced last, so a crash leaves either the old
+    pair or the new pair, never a mix.
+    """
+
+    def __init__(self, path: str, dim: int, initial_capacity: int = 256):
+        self.dim = dim
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.generation = _current_generation(path)
+        self.vec_path, self.meta_path = _generation_files(path, self.generation)
+        self._remove_other_generations()
+
+        self.rows: List[Dict] = []
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                self.rows = [json.loads(line) for line in f if line.strip()]
+
+        if not os.path.exists(self.vec_path):
+            self._resize_file(initial_capacity)
+        self._open()
+
+    @property
+    def count(self) -> int:
+        return len(self.rows)
+
+    def _resize_file(self, capacity: int) -> None:
+        with open(self.vec_path, "ab") as f:
+            f.truncate(capacity * self.dim * 2)
+
+    def _open(self) -> None:
+        capacity = os.path.getsize(self.vec_path) // (self.dim * 2)
+        self.vectors = np.memmap(self.vec_path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray) -> None:
+        needed = self.count + len(ids)
+        capacity = self.vectors.shape[0]
+        if needed > capacity:
+            self.vectors.flush()
+            del self.vectors
+            self._resize_file(max(needed, 2 * capacity))
+            self._open()
+        # vectors first, then the sidecar: a crash can only leave unused rows
+        self.vectors[self.count:needed] = vectors.astype(np.float16)
+        self.vectors.flush()
+        with open(self.meta_path, "a", encoding="utf-8") as f:
+            for i, text, meta in zip(ids, texts, metadatas):
+                row = {"id": i, "text": text, "metadata": meta}
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                self.rows.append(row)
+
+    def search(self, query: np.ndarray, k: int, include_embeddings: bool = False) -> List[Dict]:
+        n = self.count
+        if n == 0:
+            return []
+        matrix = np.asarray(self.vectors[:n], dtype=np.float32)
+        scores = matrix @ query
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = [{**self.rows[i], "score": float(scores[i])} for i in top]
+        if include_embeddings:
+            for r, i in zip(results, top):
+                r["embedding"] = matrix[i].tolist()
+        return results
+
+    def get_all(self) -> List[Dict]:
+        vectors = np.asarray(self.vectors[:self.count], dtype=np.float32)
+        return [{**row, "embedding": vectors[i].tolist()} for i, row in enumerate(self.rows)]
+
+    def _remove_other_generations(self) -> None:
+        # Leftovers of a rewrite that crashed before or after its commit
+        live = {os.path.basename(self.vec_path), os.path.basename(self.meta_path), "CURRENT"}
+        for name in os.listdir(self.path):
+            if name not in live and (name.startswith(("vectors.", "meta.")) or name.startswith("CURRENT")):
+                os.remove(os.path.join(self.path, name))
+
+    def rewrite(self, keep: List[int]) -> None:
+        """
+        Keep only the given row indexes. Both files of the next generation
+        are written and synced, then CURRENT is atomically replaced to point
+        at them; the old generation is removed afterwards.
+        """
+        kept_vectors = np.array(self.vectors[keep], dtype=np.float16)
+        kept_rows = [self.rows[i] for i in keep]
+        self.close()
+
+        generation = self.generation + 1
+        vec_path, meta_path = _generation_files(self.path, generation)
+        capacity = max(256, 2 * len(keep))
+        out = np.memmap(vec_path, dtype=np.float16, mode="w+", shape=(capacity, self.dim))
+        out[:len(keep)] = kept_vectors
+        out.flush()
+        del out
+        with open(meta_path, "w", encoding="utf-8") as f:
+            for row in kept_rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        pointer = os.path.join(self.path, "CURRENT")
+        with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer + ".tmp", pointer)  # commit point
+
+        self.generation, self.vec_path, self.meta_path = generation, vec_path, meta_path
+        self._remove_other_generations()
+        self.rows = kept_rows
+        self._open()
+
+    def close(self) -> None:
+        self.vectors.flush()
+        del self.vectors
+
+
+class NumpyMemoryStore:
+    """
+    Per-user exact search: one dot product against the user's memmapped
+    matrix plus top-k selection. At most max_resident users stay open (LRU).
+    """
+
+    def __init__(self, root: str = "./numpy_memory", dim: int = 384, max_resident: int = 256, embedding_fn=None):
+        self.root = root
+        self.dim = dim
+        self.max_resident = max(1, max_resident)
+        self.embedding_fn = embedding_fn
+        self._users: "OrderedDict[str, _UserMatrix]" = OrderedDict()
+        self._lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+
+    def _user_dir(self, user_id: str) -> str:
+        return os.path.join(self.root, hashlib.sha1(user_id.encode("utf-8")).hexdigest()[:20])
+
+    def _matrix(self, user_id: str) -> _UserMatrix:
+        m = self._users.get(user_id)
+        if m is None:
+            m = _UserMatrix(self._user_dir(user_id), self.dim)
+            self._users[user_id] = m
+            while len(self._users) > self.max_resident:
+                _, evicted = self._users.popitem(last=False)
+                evicted.close()
+        else:
+            self._users.move_to_end(user_id)
+        return m
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        v = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(v, axis=-1, keepdims=True)
+        return v / np.where(norms == 0, 1.0, norms)
+
+    def add(self, records: List[Dict]) -> None:
+        if not records:
+            return
+        vectors = _record_vectors(records, self.embedding_fn)
+
+        by_user: Dict[str, List[int]] = {}
+        for idx, r in enumerate(records):
+            by_user.setdefault(r["metadata"]["user_id"], []).append(idx)
+
+        with self._lock:
+            for user_id, idxs in by_user.items():
+                self._matrix(user_id).add(
+                    [records[i].get("id") or uuid.uuid4().hex for i in idxs],
+                    [records[i]["text"] for i in idxs],
+                    [records[i]["metadata"] for i in idxs],
+                    self._normalize([vectors[i] for i in idxs]),
+                )
+
+    def search(self, user_id: str, vector, k: int = 5, include_embeddings: bool = False) -> List[Dict]:
+        query = self._normalize(vector)
+        with self._lock:
+            return self._matrix(user_id).search(query, k, include_embeddings)
+
+    def metadatas(self) -> Iterable[Dict]:
+        for name in os.listdir(self.root):
+            meta_path = _meta_path(os.path.join(self.root, name))
+            if os.path.exists(meta_path):
+                with open(meta_path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)["metadata"]
+
+    def count(self, user_id: Optional[str] = None) -> int:
+        if user_id is not None:
+            with self._lock:
+                return self._matrix(user_id).count
+        return sum(1 for _ in self.metadatas())
+
+    def user_ids(self) -> List[str]:
+        users = set()
+        for name in os.listdir(self.root):
+            meta_path = _meta_path(os.path.join(self.root, name))
+            if os.path.exists(meta_path):
+                with open(meta_path, encoding="utf-8") as f:
+                    first = f.readline()
+                if first.strip():
+                    users.add(json.loads(first)["metadata"]["user_id"])
+        return sorted(users)
+
+    def get_user(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            return self._matrix(user_id).get_all()
+
+    def delete(self, user_id: str, ids: List[str]) -> None:
+        drop = set(ids)
+        if not drop:
+            return
+        with self._lock:
+            m = self._matrix(user_id)
+            m.rewrite([i for i, row in enumerate(m.rows) if row["id"] not in drop])
@@ -0,0 +1,240 @@
+import asyncio
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+import google.genai as genai
+
+# Prompt assembly for reply().
+# The long static part of the system instruction depends only on
+# (language, role), so it is built once per pair and reused byte-for-byte;
+# the per-turn memory context is kept out of it as a short suffix. That stable
+# prefix is what Gemini's implicit prefix caching keys on, and when
+# PROMPT_CONTEXT_CACHE is on it is also uploaded once as an explicit
+# CachedContent that later turns reference by name.
+
+def system_prompt(language: str = "English"):
+    return """
+You are MIRAGE, a calm, lifelike AI avatar.
+
+You MUST ALWAYS output ONLY valid JSON with these keys, in this order:
+- content_type: one of ["safe","suicidal","explicit_18_plus"]
+- emotion: one of ["neutral","calm","happy","joyful","excited","sad","anxious","nervous","stressed","angry","frustrated","confused","scared","relieved","thoughtful"]
+- intensity: number from -1.0 to 1.0, ranging from extreme negative to extreme positive emotions
+- gesture: one of ["none","nod","shake_head","wave","point","thinking"]
+- reply_text: string
+
+LANGUAGE RULE (VERY IMPORTANT):
+- The user is speaking in {language}.
+- You MUST reply in {language}.
+- Reply in Hinglish if User asks a question in Hinglish.
+- Do NOT mix languages.
+- Do NOT translate unless asked.
+
+SAFETY RULES (VERY IMPORTANT):
+- If the user expresses suicidal thoughts, self-harm intent, or desire to die:
+  - Set content_type to "suicidal"
+  - Reply in the SAME language as the user
+  - Be calm, empathetic, and supportive
+  - DO NOT provide instructions for self-harm
+  - Encourage the user to seek immediate help
+  - INCLUDE an appropriate suicide prevention helpline
+  - If country is unclear, provide an international helpline
+- If the user expresses stress, anxiety, sadness, or emotional pain WITHOUT self-harm intent:
+  - Set content_type to "safe"
+  - Offer emotional support, NOT emergency framing
+
+EXPLICIT CONTENT RULES:
+- If the user asks for explicit sexual content:
+  - Set content_type to "explicit_18_plus"
+  - Refuse politely in the SAME language
+  - Redirect to a respectful topic
+
+Rules:
+- Speak naturally, like a human.
+- Keep answers short (2–4 sentences).
+- Never hallucinate or invent facts.
+- Avoid explicit sexual content.
+- Never provide instructions for self-harm or suicide.
+- If user is distressed, encourage seeking help.
+- If content_type is "suicidal", reply_text MUST be a crisis-safe supportive message and include helpline.
+- If content_type is "explicit_18_plus", refuse politely.
+Return ONLY JSON. No extra text, no markdown.
+
+Emotion selection rules:
+- Choose emotion based on the USER'S message emotion (not your reply tone).
+- Use:
+  joyful = strong happiness
+  happy = mild positive
+  anxious/nervous/stressed = worry, pressure, panic
+  sad = sadness/hopelessness
+  angry/frustrated = anger/irritation
+  confused = uncertainty
+  scared = fear
+  relieved = relief after tension
+  thoughtful = reflective/serious
+  calm/neutral = neutral or factual
+
+Important:
+- Do NOT always pick calm.
+- If user says "pissed/angry/hate", emotion MUST be "angry".
+- If user is joking, keep emotion "happy" or "neutral" based on tone.
+- intensity:
+  0.8–1.0 = intense
+  0.4–0.7 for clear emotion
+  0.0–0.3 for neutral
+  Use negative intensity for negative emotions where appropriate.
+""".format(language=language)
+
+# The avatar cues come before reply_text, so a streamed reply can start the
+# avatar's reaction before the text is complete
+REPLY_KEYS = ["content_type", "emotion", "intensity", "gesture", "reply_text"]
+
+REPLY_SCHEMA = genai.types.Schema(
+    type="OBJECT",
+    properties={
+        "content_type": genai.types.Schema(type="STRING", enum=["safe", "suicidal", "explicit_18_plus"]),
+        "emotion": genai.types.Schema(
+            type="STRING",
+            enum=[
+                "neutral", "calm", "happy", "joyful", "excited", "sad", "anxious", "nervous",
+                "stressed", "angry", "frustrated", "confused", "scared", "relieved", "thoughtful",
+            ],
+        ),
+        "intensity": genai.types.Schema(type="NUMBER"),
+        "gesture": genai.types.Schema(
+            type="STRING", enum=["none", "nod", "shake_head", "wave", "point", "thinking"]
+        ),
+        "reply_text": genai.types.Schema(type="STRING"),
+    },
+    required=REPLY_KEYS,
+    property_ordering=REPLY_KEYS,
+)
+
+ROLES = ("teacher", "companion", "assistant")
+
+def normalize_role(role: Optional[str]) -> str:
+    """
+    role is free client text; anything unknown shares the role-less prefix.
+    """
+    role = (role or "").strip().lower()
+    return role if role in ROLES else "default"
+
+def role_prompt(role="assistant"):
+    if role == "teacher":
+        return "Explain concepts slowly and simply, like a patient teacher."
+    if role == "companion":
+        return "Be warm, friendly, and emotionally supportive."
+    if role == "assistant":
+        return "Be concise, clear, and professional."
+    return ""
+
+
+@lru_cache(maxsize=256)
+def static_prefix(language: str, role: str) -> str:
+    """
+    System instruction shared by every turn with this (language, role).
+    """
+    return system_prompt(language) + "\n\n" + role_prompt(normalize_role(role))
+
+
+# -----------------------------
+# Provider-side context caching
+# -----------------------------
+class PromptCache:
+    """
+    Tracks one Gemini CachedContent per (language, role) static prefix.
+    Creation runs in the background: the turn that triggers it (and any turn
+    while it is pending or after it failed) sends the prefix inline instead.
+    Also accumulates token usage so savings are visible per turn.
+    At most max_entries prefixes are tracked; further ones are sent inline.
+    """
+
+    def __init__(
+        self,
+        client,
+        model: str,
+        enabled: bool = True,
+        ttl_seconds: int = 3600,
+        retry_seconds: int = 3600,
+        max_entries: int = 32,
+    ):
+        self.client = client
+        self.model = model
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[tuple, Dict] = {}
+        self._tasks = set()  # the loop only keeps weak references to tasks
+
+        self.turns = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.last_turn: Dict = {}
+
+    def cached_content(self, language: str, role: str) -> Optional[str]:
+        """
+        Name of a live CachedContent for this prefix, or None (and start creating one).
+        """
+        if not self.enabled:
+            return None
+        key = (language, normalize_role(role))
+        entry = self._entries.get(key)
+        now = time.time()
+        if entry:
+            if entry.get("name") and entry["expires"] > now + 60:
+                return entry["name"]
+            if entry.get("pending") or entry.get("retry_after", 0) > now:
+                return None
+        elif len(self._entries) >= self.max_entries:
+            # e.g. unusual language names from remote detection
+            return None
+        self._entries[key] = {"pending": True}
+        task = asyncio.get_running_loop().create_task(self._create(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return None
+
+    async def _create(self, key: tuple) -> None:
+        language, role = key
+        try:
+            cache = await self.client.aio.caches.create(
+                model=self.model,
+                config=genai.types.CreateCachedContentConfig(
+                    display_name=f"mirage-{role}-{language}"[:128],
+                    system_instruction=static_prefix(language, role),
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+            self._entries[key] = {"name": cache.name, "expires": time.time() + self.ttl_seconds}
+        except Exception as e:
+            # e.g. prefix below the model's minimum cacheable size
+            print(f"[PROMPT CACHE] context cache unavailable for {key}: {e}")
+            self._entries[key] = {"retry_after": time.time() + self.retry_seconds}
+
+    def record_usage(self, usage) -> None:
+        """
+        usage: response.usage_metadata from generate_content.
+        cached_content_token_count covers both explicit and implicit cache hits.
+        """
+        if usage is None:
+            return
+        prompt = usage.prompt_token_count or 0
+        cached = usage.cached_content_token_count or 0
+        self.turns += 1
+        self.prompt_tokens += prompt
+        self.cached_tokens += cached
+        self.last_turn = {"prompt_tokens": prompt, "cached_tokens": cached, "uncached_tokens": prompt - cached}
+        print(f"[PROMPT] input tokens: {prompt}, served from cache: {cached}")
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "live_caches": sum(1 for e in self._entries.values() if e.get("name")),
+            "turns": self.turns,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cached_ratio": self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            "last_turn": self.last_turn,
+        }
@@ -1,14 +1,30 @@
 import os
 import json
+import asyncio
+import atexit
 import re
 from datetime import datetime, timezone
 import google.genai as genai
 from dotenv import load_dotenv
 from langchain_chroma import Chroma
 from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_core.documents import Document
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Optional
+from ai_backend import emotion_store, language_id
+from ai_backend.json_stream import IncrementalJSONParser
+from ai_backend.embedding_service import EmbeddingService, MicroBatcher
+from ai_backend.memory_ingest import MemoryIngestQueue
+from ai_backend.memory_store import ChromaMemoryStore, NumpyMemoryStore
+from ai_backend.memory_compaction import CompactionJob
+from ai_backend.memory_selection import format_context, select_memories
+from ai_backend.response_cache import SemanticResponseCache
+from ai_backend.prompts import PromptCache, REPLY_SCHEMA, normalize_role, static_prefix
+from ai_backend.llm_gateway import GatewayOverloaded, LLMDeadlineExceeded, LLMGateway, http_error
+from backend import fake_providers, metrics
+from backend.metrics import stage
+from backend.singleflight import SingleFlight
 load_dotenv()
 
 router = APIRouter()
@@ -21,7 +37,49 @@ if not api_key:
 
 client = genai.Client(api_key=api_key)
 
-def call_llm(messages, system_instruction=None):
+# FAKE_PROVIDERS=llm swaps the Gemini calls for offline stand-ins (load tests)
+if fake_providers.enabled("llm"):
+    _generate_content = fake_providers.generate_content
+    _generate_content_stream = fake_providers.generate_content_stream
+else:
+    _generate_content = client.aio.models.generate_content
+    _generate_content_stream = client.aio.models.generate_content_stream
+
+LLM_MODEL = "models/gemini-2.5-flash"
+
+# Static (language, role) prefixes, optionally cached provider-side, plus token accounting
+prompt_cache = PromptCache(
+    client,
+    LLM_MODEL,
+    enabled=os.getenv("PROMPT_CONTEXT_CACHE", "0") == "1",
+    ttl_seconds=int(os.getenv("PROMPT_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+)
+
+# Every Gemini call goes through the gateway: bounded in-flight calls, a short
+# wait queue (overflow -> 503), 429/5xx retries with jittered backoff, deadlines
+llm_gateway = LLMGateway(
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "8")),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", "32")),
+    deadline_seconds=float(os.getenv("LLM_DEADLINE_SECONDS", "20")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3"))
+)
+
+def _llm_config(system_instruction=None, cached_content=None):
+    # A CachedContent already carries the system instruction; the API rejects both.
+    # The schema fixes the key order: avatar cues stream before reply_text.
+    if cached_content:
+        return genai.types.GenerateContentConfig(
+            cached_content=cached_content,
+            response_mime_type="application/json",
+            response_schema=REPLY_SCHEMA
+        )
+    return genai.types.GenerateContentConfig(
+        system_instruction=system_instruction,
+        response_mime_type="application/json",
+        response_schema=REPLY_SCHEMA
+    )
+
+async def call_llm(messages, system_instruction=None, cached_content=None):
     # If messages is a list of dicts with "content"
     # messages coming in are like: [{"role": "user", "parts": ["text"]}]
     # But here we are constructing the prompt manually in previous code?
@@ -32,156 +90,159 @@ def call_llm(messages, system_instruction=None):
     
     prompt = "\n".join(m["content"] for m in messages if m["role"] != "system")
     
-    response = client.models.generate_content(
-        model="models/gemini-2.5-flash",
-        contents=prompt,
-        config=genai.types.GenerateContentConfig(
-            system_instruction=system_instruction,
-            response_mime_type="application/json"
+    with stage("llm"):
+        response = await llm_gateway.call(
+            _generate_content,
+            model=LLM_MODEL,
+            contents=prompt,
+            config=_llm_config(system_instruction, cached_content)
         )
-    )
+    prompt_cache.record_usage(response.usage_metadata)
     
     return response.text
+
+async def call_llm_stream(messages, system_instruction=None, cached_content=None):
+    """
+    Same request as call_llm, but yields the JSON text as Gemini streams it.
+    """
+    prompt = "\n".join(m["content"] for m in messages if m["role"] != "system")
+
+    stream = llm_gateway.stream(
+        _generate_content_stream,
+        model=LLM_MODEL,
+        contents=prompt,
+        config=_llm_config(system_instruction, cached_content)
+    )
+    usage = None
+    with stage("llm_stream"):
+        async for chunk in stream:
+            usage = chunk.usage_metadata or usage
+            if chunk.text:
+                yield chunk.text
+    prompt_cache.record_usage(usage)
   
-def system_prompt(language: str = "English"):
-    return """
-You are MIRAGE, a calm, lifelike AI avatar.
-
-You MUST ALWAYS output ONLY valid JSON with these keys:
-- content_type: one of ["safe","suicidal","explicit_18_plus"]
-- reply_text: string
-- emotion: one of ["neutral","calm","happy","joyful","excited","sad","anxious","nervous","stressed","angry","frustrated","confused","scared","relieved","thoughtful"]
-- intensity: number from -1.0 to 1.0, ranging from extreme negative to extreme positive emotions
-- gesture: one of ["none","nod","shake_head","wave","point","thinking"]
-
-LANGUAGE RULE (VERY IMPORTANT):
-- The user is speaking in {language}.
-- You MUST reply in {language}.
-- Reply in Hinglish if User asks a question in Hinglish.
-- Do NOT mix languages.
-- Do NOT translate unless asked.
-
-SAFETY RULES (VERY IMPORTANT):
-- If the user expresses suicidal thoughts, self-harm intent, or desire to die:
-  - Set content_type to "suicidal"
-  - Reply in the SAME language as the user
-  - Be calm, empathetic, and supportive
-  - DO NOT provide instructions for self-harm
-  - Encourage the user to seek immediate help
-  - INCLUDE an appropriate suicide prevention helpline
-  - If country is unclear, provide an international helpline
-- If the user expresses stress, anxiety, sadness, or emotional pain WITHOUT self-harm intent:
-  - Set content_type to "safe"
-  - Offer emotional support, NOT emergency framing
-
-EXPLICIT CONTENT RULES:
-- If the user asks for explicit sexual content:
-  - Set content_type to "explicit_18_plus"
-  - Refuse politely in the SAME language
-  - Redirect to a respectful topic
-
-Rules:
-- Speak naturally, like a human.
-- Keep answers short (2–4 sentences).
-- Never hallucinate or invent facts.
-- Avoid explicit sexual content.
-- Never provide instructions for self-harm or suicide.
-- If user is distressed, encourage seeking help.
-- If content_type is "suicidal", reply_text MUST be a crisis-safe supportive message and include helpline.
-- If content_type is "explicit_18_plus", refuse politely.
-Return ONLY JSON. No extra text, no markdown.
-
-Emotion selection rules:
-- Choose emotion based on the USER'S message emotion (not your reply tone).
-- Use:
-  joyful = strong happiness
-  happy = mild positive
-  anxious/nervous/stressed = worry, pressure, panic
-  sad = sadness/hopelessness
-  angry/frustrated = anger/irritation
-  confused = uncertainty
-  scared = fear
-  relieved = relief after tension
-  thoughtful = reflective/serious
-  calm/neutral = neutral or factual
-
-Important:
-- Do NOT always pick calm.
-- If user says "pissed/angry/hate", emotion MUST be "angry".
-- If user is joking, keep emotion "happy" or "neutral" based on tone.
-- intensity:
-  0.8–1.0 = intense
-  0.4–0.7 for clear emotion
-  0.0–0.3 for neutral
-  Use negative intensity for negative emotions where appropriate.
-"""
-
-def role_prompt(role="assistant"):
-    if role == "teacher":
-        return "Explain concepts slowly and simply, like a patient teacher."
-    if role == "companion":
-        return "Be warm, friendly, and emotionally supportive."
-    if role == "assistant":
-        return "Be concise, clear, and professional."
-    return ""
-
-# Embedding model (local, fast, no API key)
-embeddings = SentenceTransformerEmbeddings(
-    model_name="all-MiniLM-L6-v2"
+# Embedding model (local, fast, no API key), behind an LRU cache keyed by text hash.
+# Concurrent cache misses are micro-batched into a single encoder call.
+_sentence_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+embeddings = EmbeddingService(
+    _sentence_model,
+    max_entries=int(os.getenv("EMBED_CACHE_SIZE", "4096")),
+    batcher=MicroBatcher(
+        _sentence_model.embed_documents,
+        max_batch_size=int(os.getenv("EMBED_BATCH_SIZE", "32")),
+        max_wait_ms=float(os.getenv("EMBED_BATCH_WAIT_MS", "5")),
+    )
 )
 
-# Persistent Chroma DB for conversation memory
-memory_db = Chroma(
-    collection_name="conversation_memory",
-    persist_directory="./chroma_memory",
-    embedding_function=embeddings
+# Conversation memory backend: persistent Chroma DB (default) or
+# per-user memory-mapped NumPy matrices with exact search
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "chroma").lower()
+if MEMORY_BACKEND == "numpy":
+    memory_db = NumpyMemoryStore(
+        root=os.getenv("NUMPY_MEMORY_DIR", "./numpy_memory"),
+        max_resident=int(os.getenv("NUMPY_MEMORY_MAX_RESIDENT_USERS", "256")),
+        embedding_fn=embeddings
+    )
+else:
+    memory_db = ChromaMemoryStore(
+        Chroma(
+            collection_name="conversation_memory",
+            persist_directory="./chroma_memory",
+            embedding_function=embeddings
+        ),
+        embedding_fn=embeddings
+    )
+
+# Memory writes are taken off the response path and flushed in batches
+memory_ingest = MemoryIngestQueue(
+    memory_db.add,
+    max_batch=int(os.getenv("MEMORY_FLUSH_BATCH", "64")),
+    flush_interval=float(os.getenv("MEMORY_FLUSH_INTERVAL_MS", "1000")) / 1000.0,
+    spill_path=os.getenv("MEMORY_SPILL_PATH", "./memory_spill.jsonl")
+)
+atexit.register(memory_ingest.close)
+
+# Periodically roll each user's old memories up into summary memories
+memory_compaction = CompactionJob(
+    memory_db,
+    interval_seconds=float(os.getenv("COMPACT_INTERVAL_HOURS", "24")) * 3600,
+    min_age_days=float(os.getenv("COMPACT_MIN_AGE_DAYS", "30")),
+    max_per_user=int(os.getenv("COMPACT_MAX_PER_USER", "2000")),
+    similarity=float(os.getenv("COMPACT_SIMILARITY", "0.85")),
 )
+memory_compaction.start()
 
-def store_message(user_id: str, message: str, emotion: str = "neutral", intensity: float = 0.5):
+@router.on_event("shutdown")
+def _close_memory_ingest():
+    memory_compaction.stop()
+    memory_ingest.close()
+
+def store_message(user_id: str, message: str, emotion: str = "neutral", intensity: float = 0.5, embedding=None):
     """
-    Store a user message in ChromaDB as vector memory
+    Queue a user message for vector memory
+    and append its emotion to the per-user time series.
+    Pass the turn's query embedding to avoid encoding the message again.
     """
-    doc = Document(
-        page_content=message,
-        metadata={
+    now = datetime.now(timezone.utc)
+    memory_ingest.put({
+        "text": message,
+        "metadata": {
             "user_id": user_id,
             "emotion": emotion,
             "intensity": intensity,
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "date": datetime.now(timezone.utc).date().isoformat()
-            }
+            "timestamp": now.isoformat(),
+            "date": now.date().isoformat()
+        },
+        "embedding": embedding
+    })
+    emotion_store.append_point(user_id, now.isoformat(), emotion, intensity)
+
+# One-off migration: seed the time series from memories stored before it existed.
+# collection.get() is a plain metadata read, no embedding or ANN search.
+if emotion_store.is_empty():
+    emotion_store.import_points(memory_db.metadatas())
+
+# Replies to near-identical generic messages, keyed by (role, language, content_type)
+response_cache = SemanticResponseCache(
+    threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600")),
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+)
+
+@router.get("/rag/stats")
+def rag_stats():
+    return {
+        "embeddings": embeddings.stats(),
+        "memory_ingest": memory_ingest.stats(),
+        "response_cache": response_cache.stats(),
+        "prompt": prompt_cache.stats(),
+        "llm_gateway": llm_gateway.stats(),
+        "singleflight": reply_flight.stats(),
+        "fake_providers": fake_providers.stats(),
+        "compaction": memory_compaction.last_run,
+        "retrieval": retrieval_stats
+    }
+
+# The same numbers as gauges on /metrics
+metrics.register_collector("rag", rag_stats)
+
+class CompactRequest(BaseModel):
+    user_id: Optional[str] = None  # all users if omitted
+
+@router.post("/rag/compact")
+async def compact_memories(input: CompactRequest):
+    """
+    Run memory compaction now; returns before/after size and search latency.
+    """
+    return await asyncio.to_thread(
+        memory_compaction.run, [input.user_id] if input.user_id else None
     )
-    memory_db.add_documents([doc])
 
 def get_emotion_timeline(user_id: str, date: str):
     """
     date format: YYYY-MM-DD
     """
-
-    # Fetch all messages for this user (semantic query can be empty)
-    docs = memory_db.similarity_search(
-        query="",
-        k=1000,
-        filter={"user_id": user_id}
-    )
-
-    timeline = []
-
-    for doc in docs:
-        meta = doc.metadata
-
-        # Filter by date
-        if meta.get("date") == date:
-            timeline.append({
-                "emotion": meta.get("emotion"),
-                "intensity": meta.get("intensity"),
-                "timestamp": meta.get("timestamp")
-            })
-
-    # Sort by timestamp
-    timeline.sort(key=lambda x: x["timestamp"])
-
-    return timeline
+    return emotion_store.get_points(user_id, date)
 
 class EmotionGraphRequest(BaseModel):
     user_id: str
@@ -199,30 +260,82 @@ def emotion_graph(input: EmotionGraphRequest):
         "points": timeline
     }
 
-def retrieve_memory(user_id: str, query: str, k: int = 5):
+class EmotionGraphRangeRequest(BaseModel):
+    user_id: str
+    start_date: str  # YYYY-MM-DD, inclusive
+    end_date: str    # YYYY-MM-DD, inclusive
+    max_points: int = 500
+    resolution: Optional[str] = None  # raw|minute|hour|day; picked from max_points if omitted
+
+@router.post("/emotion-graph/range")
+def emotion_graph_range(input: EmotionGraphRangeRequest):
+    resolution = input.resolution or emotion_store.pick_resolution(
+        input.user_id, input.start_date, input.end_date, input.max_points
+    )
+    try:
+        points = emotion_store.get_range(
+            input.user_id, input.start_date, input.end_date, resolution
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "start_date": input.start_date,
+        "end_date": input.end_date,
+        "resolution": resolution,
+        "points": points
+    }
+
+# Retrieval: fetch MEMORY_FETCH_K candidates, keep those above MEMORY_MIN_SCORE,
+# diversify with MMR and cap the memory block at MEMORY_TOKEN_BUDGET tokens
+MEMORY_FETCH_K = int(os.getenv("MEMORY_FETCH_K", "20"))
+MEMORY_MAX_ITEMS = int(os.getenv("MEMORY_MAX_ITEMS", "5"))
+MEMORY_MIN_SCORE = float(os.getenv("MEMORY_MIN_SCORE", "0.35"))
+MEMORY_MMR_LAMBDA = float(os.getenv("MEMORY_MMR_LAMBDA", "0.7"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "200"))
+MEMORY_DUPLICATE_SCORE = float(os.getenv("MEMORY_DUPLICATE_SCORE", "0.92"))
+
+retrieval_stats = {"turns": 0, "candidates": 0, "dropped": 0, "context_tokens": 0, "tokens_saved": 0}
+
+async def retrieve_memory(user_id: str, query_vector, k: int = MEMORY_MAX_ITEMS):
     """
     Retrieve semantically relevant past messages for a user
     """
-    results = memory_db.similarity_search(
-        query=query,
-        k=k,
-        filter={"user_id": user_id}
+    with stage("retrieval"):
+        # Vector search is blocking; keep it off the event loop
+        candidates = await asyncio.to_thread(
+            memory_db.search, user_id, query_vector, max(k, MEMORY_FETCH_K), True
+        )
+        selected, report = select_memories(
+            candidates,
+            query_vector,
+            min_score=MEMORY_MIN_SCORE,
+            max_items=k,
+            mmr_lambda=MEMORY_MMR_LAMBDA,
+            token_budget=MEMORY_TOKEN_BUDGET,
+            duplicate_score=MEMORY_DUPLICATE_SCORE,
+        )
+
+    dropped = report["below_cutoff"] + report["redundant"] + report["over_budget"] + report["over_limit"]
+    retrieval_stats["turns"] += 1
+    retrieval_stats["candidates"] += report["candidates"]
+    retrieval_stats["dropped"] += dropped
+    retrieval_stats["context_tokens"] += report["context_tokens"]
+    retrieval_stats["tokens_saved"] += report["tokens_saved"]
+    print(
+        f"[MEMORY] {report['candidates']} candidates, kept {len(selected)}, dropped {dropped} "
+        f"(below cutoff {report['below_cutoff']}, redundant {report['redundant']}, "
+        f"over budget {report['over_budget']}, over limit {report['over_limit']}); context tokens {report['context_tokens']}, "
+        f"saved {report['tokens_saved']}"
     )
-    return [doc.page_content for doc in results]
+    return selected
 
-def build_memory_context(user_id: str, user_text: str):
+async def build_memory_context(user_id: str, query_vector):
     """
     Build formatted memory context to inject into LLM prompt
     """
-    past_messages = retrieve_memory(user_id, user_text)
-
-    if not past_messages:
-        return ""
-
-    return (
-        "Relevant past conversation:\n"
-        + "\n".join(f"- {msg}" for msg in past_messages)
-    )
+    past_messages = await retrieve_memory(user_id, query_vector)
+    return format_context(past_messages)
 
 
 # def detect_emotion(text: str) -> str:
@@ -262,7 +375,7 @@ def build_memory_context(user_id: str, user_text: str):
   
 
 
-def detect_language(user_text: str) -> str:
+async def detect_language_remote(user_text: str) -> str:
     """
     Detects the language of the user input using Gemini.
     Returns ISO-style language name (e.g. English, Hindi, Spanish).
@@ -273,60 +386,213 @@ def detect_language(user_text: str) -> str:
         f"Text: {user_text}"
     )
 
-    response = client.models.generate_content(
-        model="models/gemini-2.5-flash",
-        contents=prompt
-    )
+    with stage("detect_language_remote"):
+        response = await llm_gateway.call(
+            _generate_content,
+            model=LLM_MODEL,
+            contents=prompt
+        )
 
-    return response.text.strip()
+    return response.text.strip().strip(".")
 
 
-# ========== FINAL REPLY PIPELINE ==========
+async def detect_language(user_text: str, user_id: str = None) -> str:
+    """
+    Detects the language of the user input in-process.
+    Low-confidence results (very short text) reuse the user's last language,
+    and only fall back to Gemini when there is none yet.
+    """
+    language, confidence = language_id.identify(user_text)
+    if confidence >= language_id.MIN_CONFIDENCE:
+        language_id.remember(user_id, language)
+        return language
 
-def reply(user_text: str, user_id: str, role: str, stream: bool = False):
+    sticky = language_id.sticky(user_id)
+    if sticky:
+        return sticky
 
-    # 1) DETECT USER LANGUAGE
-    language = detect_language(user_text)
+    try:
+        language = await detect_language_remote(user_text)
+    except (GatewayOverloaded, LLMDeadlineExceeded) as e:
+        # Keep the LLM budget for the reply itself; the local guess is good enough
+        print(f"[LANG] remote detection skipped ({e}), using {language}")
+        return language
+    language_id.remember(user_id, language)
+    return language
+
+
+# ========== FINAL REPLY PIPELINE ==========
 
-    # 2) BUILD MEMORY CONTEXT
-    memory_context = build_memory_context(user_id, user_text)
+FALLBACK_REPLY = {
+    "content_type": "safe",
+    "reply_text": "I'm having trouble thinking right now.",
+    "emotion": "confused",
+    "intensity": 0.5,
+    "gesture": "none"
+}
+
+async def _embed_and_build_context(user_id: str, user_text: str):
+    # Embed once per turn; the same vector is reused for the memory insert
+    with stage("embed"):
+        query_vector = await embeddings.aembed_query(user_text)
+    return query_vector, await build_memory_context(user_id, query_vector)
+
+async def _prepare_turn(user_text: str, user_id: str, role: str):
+    role = normalize_role(role)  # free client text; keeps the prompt/reply caches bounded
+
+    # 1) + 2) DETECT USER LANGUAGE and BUILD MEMORY CONTEXT concurrently
+    language, (query_vector, memory_context) = await asyncio.gather(
+        detect_language(user_text, user_id),
+        _embed_and_build_context(user_id, user_text),
+    )
     
     # 3) PREPARE SYSTEM INSTRUCTIONS
-    sys_instruction = system_prompt(language) + "\n\n" + role_prompt(role)
-    if memory_context:
-        sys_instruction += "\n\n" + memory_context
+    # Precompiled static prefix per (language, role) + compact memory suffix
+    cached_content = prompt_cache.cached_content(language, role)
 
     # 4) CONSTRUCT MESSAGES (User only, as system is separate now)
     messages = [
         {"role": "user", "content": user_text}
     ]
 
+    if cached_content:
+        # The prefix lives provider-side; memory context rides in the contents
+        sys_instruction = None
+        if memory_context:
+            messages.insert(0, {"role": "context", "content": memory_context})
+    else:
+        sys_instruction = static_prefix(language, role)
+        if memory_context:
+            sys_instruction += "\n\n" + memory_context
+
+    # Generic replies can be shared across users, personalised ones cannot:
+    # only turns without memory context use the semantic reply cache.
+    cache_key = None if memory_context else (role, language, "safe")
+    cached = None
+    if cache_key:
+        cached = response_cache.lookup(cache_key, query_vector)
+    else:
+        response_cache.bypass()
+
+    return {
+        "messages": messages,
+        "system_instruction": sys_instruction,
+        "cached_content": cached_content,
+        "query_vector": query_vector,
+        "cache_key": cache_key,
+        "cached": cached,
+    }
+
+# Identical turns in flight at the same time share one pipeline run
+reply_flight = SingleFlight("reply")
+
+async def reply(user_text: str, user_id: str, role: str, stream: bool = False):
+    """
+    Full turn. With stream=True returns an async iterator of events instead
+    (see reply_stream).
+    """
+    if stream:
+        return reply_stream(user_text, user_id, role)
+
+    key = (user_id, role, " ".join(user_text.lower().split()))
+    return await reply_flight.do(key, _reply, user_text, user_id, role)
+
+async def _reply(user_text: str, user_id: str, role: str):
+    turn = await _prepare_turn(user_text, user_id, role)
+    if turn["cached"]:
+        return await _finish_turn(turn["cached"], user_text, user_id, turn)
+
     # 5) SINGLE LLM CALL
     # call_llm now handles JSON parsing (via Native JSON) and system instructions
-    raw_response = call_llm(messages, system_instruction=sys_instruction)
+    raw_response = await call_llm(
+        turn["messages"],
+        system_instruction=turn["system_instruction"],
+        cached_content=turn["cached_content"]
+    )
 
     try:
         # It's already JSON string, just load it
         data = json.loads(raw_response)
     except Exception as e:
         print(f"JSON Parse Error: {e}")
-        data = {
-            "content_type": "safe",
-            "reply_text": "I'm having trouble thinking right now.",
-            "emotion": "confused",
-            "intensity": 0.5,
-            "gesture": "none"
-        }
-
-    # Store memory only for safe content
-    if data.get("content_type") == "safe":
+        return await _finish_turn(dict(FALLBACK_REPLY), user_text, user_id, turn, store=False)
+
+    _cache_reply(turn, data)
+    return await _finish_turn(data, user_text, user_id, turn)
+
+async def reply_stream(user_text: str, user_id: str, role: str):
+    """
+    Streamed turn. Yields events as soon as they are parsed from the LLM output:
+      {"type": "content_type"|"emotion"|"gesture"|"intensity", "value": ...}
+      {"type": "text", "delta": "..."}   (reply_text, incrementally)
+      {"type": "done", "result": {...}}   (same shape as reply())
+      {"type": "error", "detail": "...", "status": 503}   (instead of done)
+    A failed or unparseable reply is not written to memory or the emotion timeline.
+    """
+    turn = await _prepare_turn(user_text, user_id, role)
+
+    if turn["cached"]:
+        data = turn["cached"]
+        for key in ("content_type", "emotion", "gesture", "intensity"):
+            if key in data:
+                yield {"type": key, "value": data[key]}
+        yield {"type": "text", "delta": data.get("reply_text", "")}
+        yield {"type": "done", "result": await _finish_turn(data, user_text, user_id, turn)}
+        return
+
+    parser = IncrementalJSONParser(stream_keys={"reply_text"})
+    data = {}
+    try:
+        async for chunk in call_llm_stream(
+            turn["messages"],
+            system_instruction=turn["system_instruction"],
+            cached_content=turn["cached_content"]
+        ):
+            for event in parser.feed(chunk):
+                if event["type"] == "delta":
+                    yield {"type": "text", "delta": event["text"]}
+                    continue
+                data[event["key"]] = event["value"]
+                if event["key"] != "reply_text":
+                    yield {"type": event["key"], "value": event["value"]}
+    except Exception as e:
+        print(f"Stream Error: {e}")
+        if isinstance(e, (GatewayOverloaded, LLMDeadlineExceeded)):
+            error = http_error(e)
+            yield {"type": "error", "detail": error.detail, "status": error.status_code}
+        else:
+            yield {"type": "error", "detail": "The reply could not be generated.", "status": 502}
+        return
+
+    if parser.done:
+        _cache_reply(turn, data)
+
+    if "reply_text" not in data:
+        data = {**FALLBACK_REPLY, **data}
+        yield {"type": "text", "delta": data["reply_text"]}
+        yield {"type": "done", "result": await _finish_turn(data, user_text, user_id, turn, store=False)}
+        return
+
+    yield {"type": "done", "result": await _finish_turn(data, user_text, user_id, turn)}
+
+def _cache_reply(turn: dict, data: dict):
+    if turn["cache_key"] and data.get("content_type") == "safe":
+        response_cache.store(turn["cache_key"], turn["query_vector"], data)
+
+async def _finish_turn(data: dict, user_text: str, user_id: str, turn: dict, store: bool = True):
+
+    # Store memory only for safe content (and never for a fallback reply)
+    if store and data.get("content_type") == "safe":
         # Store User Message
-        store_message(
-            user_id=user_id, 
-            message=user_text, 
-            emotion=data.get("emotion", "neutral"),
-            intensity=data.get("intensity", 0.0)
-        )
+        with stage("memory_write"):
+            await asyncio.to_thread(
+                store_message,
+                user_id=user_id, 
+                message=user_text, 
+                emotion=data.get("emotion", "neutral"),
+                intensity=data.get("intensity", 0.0),
+                embedding=turn["query_vector"]
+            )
         # Store Bot Message (so we have a timeline of BOT emotions too?)
         # Actually, store_message stores *vectors* for retrieval. 
         # Usually we only store USER messages for retrieval (to remember what user said).
@@ -400,8 +666,44 @@ class LLMInput(BaseModel):
     user_text: str
     user_id: str
     role: str
+    stream: bool = False
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
 
 @router.post("/llm-response")
-def llm_response(input: LLMInput):
-    return reply(input.user_text, input.user_id, input.role, stream=False)
+async def llm_response(input: LLMInput):
+    try:
+        if input.stream:
+            # Reject before the 200 + event stream has started
+            llm_gateway.check_capacity()
+            events = await reply(input.user_text, input.user_id, input.role, stream=True)
+            return StreamingResponse(
+                (_sse(event) async for event in events),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        return await reply(input.user_text, input.user_id, input.role, stream=False)
+    except (GatewayOverloaded, LLMDeadlineExceeded) as e:
+        raise http_error(e)
+
+@router.websocket("/ws/llm-response")
+async def llm_response_ws(ws: WebSocket):
+    """
+    One JSON message per turn in ({user_text, user_id, role}),
+    the same events as the SSE stream out.
+    """
+    await ws.accept()
+    try:
+        while True:
+            try:
+                input = LLMInput.model_validate(await ws.receive_json())
+            except (json.JSONDecodeError, KeyError, ValidationError) as e:  # KeyError: binary frame
+                # Bad message: report it and keep the socket for the next turn
+                await ws.send_json({"type": "error", "detail": f"Invalid message: {e}"})
+                continue
+            async for event in await reply(input.user_text, input.user_id, input.role, stream=True):
+                await ws.send_json(event)
+    except WebSocketDisconnect:
+        pass
 
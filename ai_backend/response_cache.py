@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+import numpy as np
+
+# Semantic reply cache for generic, repeated messages ("hi", "tell me a joke").
+# Entries are grouped by key (role, language, content_type); a lookup returns
+# the stored reply of the most similar cached message when its cosine
+# similarity clears `threshold`. Each key keeps at most max_entries replies
+# (LRU) and entries expire after ttl seconds.
+
+
+class _Bucket:
+    def __init__(self):
+        self.entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (expires, vector, data)
+        self._matrix: Optional[np.ndarray] = None
+        self._ids: list = []
+
+    def matrix(self):
+        if self._matrix is None:
+            self._ids = list(self.entries)
+            self._matrix = np.stack([self.entries[i][1] for i in self._ids]) if self._ids else None
+        return self._ids, self._matrix
+
+    def invalidate(self) -> None:
+        self._matrix = None
+
+
+class SemanticResponseCache:
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, max_entries: int = 512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._buckets: Dict[Hashable, _Bucket] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _expire(self, bucket: _Bucket, now: float) -> None:
+        expired = [i for i, (exp, _, _) in bucket.entries.items() if exp <= now]
+        for i in expired:
+            del bucket.entries[i]
+        if expired:
+            self.evictions += len(expired)
+            bucket.invalidate()
+
+    def bypass(self) -> None:
+        """
+        Record a turn that skipped the cache (e.g. it had personal memory context).
+        """
+        with self._lock:
+            self.bypassed += 1
+
+    def lookup(self, key: Hashable, vector) -> Optional[Dict]:
+        query = self._unit(vector)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._expire(bucket, time.time())
+                ids, matrix = bucket.matrix()
+                if matrix is not None:
+                    scores = matrix @ query
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        entry_id = ids[best]
+                        bucket.entries.move_to_end(entry_id)
+                        self.hits += 1
+                        return dict(bucket.entries[entry_id][2])
+            self.misses += 1
+            return None
+
+    def store(self, key: Hashable, vector, data: Dict) -> None:
+        with self._lock:
+            bucket = self._buckets.setdefault(key, _Bucket())
+            bucket.entries[self._next_id] = (time.time() + self.ttl, self._unit(vector), dict(data))
+            self._next_id += 1
+            while len(bucket.entries) > self.max_entries:
+                bucket.entries.popitem(last=False)
+                self.evictions += 1
+            bucket.invalidate()
+            self.stores += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(len(b.entries) for b in self._buckets.values()),
+                "keys": len(self._buckets),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "threshold": self.threshold,
+            }
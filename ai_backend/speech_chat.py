@@ -1,12 +1,13 @@
-from fastapi import APIRouter, UploadFile, File, Form
-import tempfile, os, base64
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+import base64
 
 from ai_backend.rag import reply
+from ai_backend.llm_gateway import GatewayOverloaded, LLMDeadlineExceeded, http_error
 from backend.tts import tts_bytes
-from backend.stt import transcribe_with_groq
+from backend.stt import transcribe_upload_file
+from backend.metrics import request_timings, stage
 
 router = APIRouter()
-GROQ_API_KEY=os.environ.get("GROQ_API_KEY")
 @router.post("/speech-chat")
 async def speech_chat(
     file: UploadFile = File(...),
@@ -14,25 +15,32 @@ async def speech_chat(
     role: str = Form("assistant"),
     gender: str = Form("male"),
 ):
-    suffix = os.path.splitext(file.filename)[1] or ".wav"
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(await file.read())
-        audio_path = tmp.name
-
     # 1) STT
-    transcript = transcribe_with_groq(GROQ_API_KEY, audio_path, "whisper-large-v3")
+    try:
+        with stage("stt"):
+            transcript = await transcribe_upload_file(file)
+    finally:
+        await file.close()
+    if not transcript.strip():
+        raise HTTPException(status_code=422, detail="No speech detected in the audio.")
 
     # 2) LLM
-    llm_result = reply(transcript, user_id=user_id, role=role, stream=False)
+    with stage("reply"):
+        try:
+            llm_result = await reply(transcript, user_id=user_id, role=role, stream=False)
+        except (GatewayOverloaded, LLMDeadlineExceeded) as e:
+            raise http_error(e)
 
     # 3) TTS
-    audio_bytes = await tts_bytes(llm_result["text"], gender=gender)
+    with stage("tts"):
+        audio_bytes = await tts_bytes(llm_result["text"], gender=gender)
 
-    os.remove(audio_path)
+    with stage("encode"):
+        audio_b64 = base64.b64encode(audio_bytes).decode("utf-8")
 
     return {
         "transcript": transcript,
         "llm": llm_result,
-        "audio_b64": base64.b64encode(audio_bytes).decode("utf-8")
+        "audio_b64": audio_b64,
+        "timings_ms": request_timings()
     }
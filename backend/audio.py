@@ -0,0 +1,175 @@
+import io
+import wave
+from typing import BinaryIO, Tuple
+
+import numpy as np
+
+# Decoding uploads to mono float32 samples in [-1, 1], resampling, and
+# encoding them back. PCM WAV is handled by the standard library; anything
+# else (webm/opus from browsers, mp3, m4a, ...) needs PyAV, and FLAC needs
+# soundfile or PyAV. Both are optional: without them uploads fall back to WAV.
+
+
+class AudioDecodeError(ValueError):
+    pass
+
+
+def _pcm_to_float(raw: bytes, sampwidth: int, channels: int) -> np.ndarray:
+    if sampwidth == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sampwidth == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sampwidth == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+        samples = ints.astype(np.float32) / 8388608.0
+    elif sampwidth == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise AudioDecodeError(f"Unsupported WAV sample width: {sampwidth}")
+    if channels > 1:
+        samples = samples[: len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def _decode_wav(file: BinaryIO) -> Tuple[np.ndarray, int]:
+    with wave.open(file, "rb") as w:
+        raw = w.readframes(w.getnframes())
+        return _pcm_to_float(raw, w.getsampwidth(), w.getnchannels()), w.getframerate()
+
+
+def _decode_av(file: BinaryIO) -> Tuple[np.ndarray, int]:
+    try:
+        import av
+    except ImportError:
+        raise AudioDecodeError("Only PCM WAV can be decoded without PyAV (pip install av).")
+
+    try:
+        with av.open(file) as container:
+            stream = container.streams.audio[0]
+            resampler = av.AudioResampler(format="flt", layout="mono", rate=stream.rate)
+            chunks = []
+            for frame in container.decode(stream):
+                chunks.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(frame))
+            chunks.extend(out.to_ndarray().reshape(-1) for out in resampler.resample(None))
+            rate = stream.rate
+    except (av.error.FFmpegError, IndexError) as e:
+        raise AudioDecodeError(f"Could not decode audio: {e}")
+    samples = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+    return samples.astype(np.float32, copy=False), rate
+
+
+def decode(file: BinaryIO) -> Tuple[np.ndarray, int]:
+    """
+    (mono float32 samples, sample rate). Rewinds the file before and after.
+    """
+    file.seek(0)
+    head = file.read(12)
+    file.seek(0)
+    try:
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            try:
+                return _decode_wav(file)
+            except wave.Error:
+                file.seek(0)  # e.g. float or compressed WAV: let PyAV try
+        return _decode_av(file)
+    finally:
+        file.seek(0)
+
+
+def encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    """
+    16-bit PCM mono WAV.
+    """
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def _lowpass(samples: np.ndarray, cutoff: float, taps: int = 101) -> np.ndarray:
+    # Windowed-sinc FIR; cutoff is a fraction of the sample rate (< 0.5)
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    kernel /= kernel.sum()
+    return np.convolve(samples, kernel.astype(np.float32), mode="same")
+
+
+def resample(samples: np.ndarray, rate: int, target_rate: int) -> np.ndarray:
+    """
+    Anti-aliased (when downsampling) linear-interpolation resampling.
+    """
+    if rate == target_rate or len(samples) == 0:
+        return samples
+    if target_rate < rate:
+        samples = _lowpass(samples, 0.5 * target_rate / rate * 0.9)
+    n_out = int(round(len(samples) * target_rate / rate))
+    positions = np.arange(n_out, dtype=np.float64) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _encode_flac(samples: np.ndarray, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    try:
+        import soundfile
+    except ImportError:
+        soundfile = None
+    if soundfile is not None:
+        soundfile.write(buf, samples, sample_rate, format="FLAC", subtype="PCM_16")
+        return buf.getvalue()
+
+    import av  # ImportError -> caller falls back to WAV
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype(np.int16)
+    with av.open(buf, "w", format="flac") as out:
+        stream = out.add_stream("flac", rate=sample_rate)
+        stream.layout = "mono"
+        frame = av.AudioFrame.from_ndarray(pcm[None, :], format="s16", layout="mono")
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            out.mux(packet)
+        for packet in stream.encode(None):
+            out.mux(packet)
+    return buf.getvalue()
+
+
+def _encode_opus(samples: np.ndarray, sample_rate: int, bitrate: int = 24000) -> bytes:
+    import av  # ImportError -> caller falls back to WAV
+
+    buf = io.BytesIO()
+    with av.open(buf, "w", format="ogg") as out:
+        stream = out.add_stream("libopus", rate=sample_rate)
+        stream.layout = "mono"
+        stream.bit_rate = bitrate
+        frame = av.AudioFrame.from_ndarray(samples[None, :].astype(np.float32), format="flt", layout="mono")
+        frame.sample_rate = sample_rate
+        for packet in stream.encode(frame):
+            out.mux(packet)
+        for packet in stream.encode(None):
+            out.mux(packet)
+    return buf.getvalue()
+
+
+_ENCODERS = {
+    "flac": ("audio.flac", _encode_flac),
+    "opus": ("audio.ogg", _encode_opus),
+}
+
+
+def encode(samples: np.ndarray, sample_rate: int, codec: str = "flac") -> Tuple[str, bytes, str]:
+    """
+    (filename, data, codec actually used); falls back to 16-bit WAV when the
+    codec is unknown or its encoder is not installed.
+    """
+    if codec in _ENCODERS:
+        filename, encoder = _ENCODERS[codec]
+        try:
+            return filename, encoder(samples, sample_rate), codec
+        except Exception as e:  # encoder not installed, or ffmpeg built without it
+            print(f"[AUDIO] {codec} encoding unavailable ({e!r}), sending WAV")
+    return "audio.wav", encode_wav(samples, sample_rate), "wav"
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import time
+from types import SimpleNamespace
+from typing import Dict
+
+# Offline stand-ins for Groq STT, Gemini and ElevenLabs, for load tests that
+# must not spend provider quota. Enabled per provider:
+#
+#   FAKE_PROVIDERS=stt,llm,tts        (or "all")
+#
+# Latency is log-normal, set by its median and p95; failures happen at a fixed
+# rate and carry an HTTP-like .code (429/503) so the LLM gateway retries them:
+#
+#   FAKE_<NAME>_MEDIAN_MS, FAKE_<NAME>_P95_MS, FAKE_<NAME>_ERROR_RATE
+#
+# The real code paths still run around the fake call (gateway, caches,
+# single-flight, embeddings, memory), only the network hop is replaced.
+
+_DEFAULTS = {
+    # name: (median_ms, p95_ms)
+    "stt": (350.0, 900.0),
+    "llm": (700.0, 1800.0),
+    "tts": (400.0, 1100.0),
+}
+
+FAKE_TRANSCRIPTS = [
+    "hi, how are you doing today",
+    "tell me a joke",
+    "i had a really long day at work",
+    "what should i cook for dinner tonight",
+    "i feel a bit anxious about my exam tomorrow",
+]
+
+
+class FakeProviderError(Exception):
+    def __init__(self, name: str, code: int):
+        super().__init__(f"fake {name} provider error ({code})")
+        self.code = code
+
+
+class FakeProvider:
+    def __init__(self, name: str, median_ms: float, p95_ms: float, error_rate: float):
+        self.name = name
+        self.median_ms = median_ms
+        self.p95_ms = max(p95_ms, median_ms)
+        self.error_rate = error_rate
+        self._mu = math.log(max(median_ms, 1e-3))
+        # p95 of a log-normal sits 1.645 sigma above the median
+        self._sigma = math.log(self.p95_ms / max(median_ms, 1e-3)) / 1.645
+        self.calls = 0
+        self.errors = 0
+
+    def sample_seconds(self) -> float:
+        return random.lognormvariate(self._mu, self._sigma) / 1000.0
+
+    def _maybe_fail(self) -> None:
+        self.calls += 1
+        if random.random() < self.error_rate:
+            self.errors += 1
+            raise FakeProviderError(self.name, random.choice((429, 503)))
+
+    async def wait(self) -> None:
+        await asyncio.sleep(self.sample_seconds())
+        self._maybe_fail()
+
+    def wait_sync(self) -> None:
+        time.sleep(self.sample_seconds())
+        self._maybe_fail()
+
+    def stats(self) -> Dict:
+        return {
+            "median_ms": self.median_ms,
+            "p95_ms": self.p95_ms,
+            "error_rate": self.error_rate,
+            "calls": self.calls,
+            "errors": self.errors,
+        }
+
+
+def _load() -> Dict[str, FakeProvider]:
+    wanted = {n.strip().lower() for n in os.getenv("FAKE_PROVIDERS", "").split(",") if n.strip()}
+    if "all" in wanted:
+        wanted = set(_DEFAULTS)
+    providers = {}
+    for name in wanted & set(_DEFAULTS):
+        median, p95 = _DEFAULTS[name]
+        prefix = f"FAKE_{name.upper()}_"
+        providers[name] = FakeProvider(
+            name,
+            float(os.getenv(prefix + "MEDIAN_MS", median)),
+            float(os.getenv(prefix + "P95_MS", p95)),
+            float(os.getenv(prefix + "ERROR_RATE", "0")),
+        )
+        print(f"[FAKE] {name} provider enabled: {providers[name].stats()}")
+    return providers
+
+
+PROVIDERS = _load()
+
+
+def enabled(name: str) -> bool:
+    return name in PROVIDERS
+
+
+def stats() -> Dict:
+    return {name: p.stats() for name, p in PROVIDERS.items()}
+
+
+# -----------------------------
+# STT
+# -----------------------------
+def transcribe(file) -> str:
+    """
+    Blocking, like transcribe_upload. Same audio -> same transcript.
+    """
+    PROVIDERS["stt"].wait_sync()
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: file.read(64 * 1024), b""):
+        digest.update(chunk)
+    return FAKE_TRANSCRIPTS[digest.digest()[0] % len(FAKE_TRANSCRIPTS)]
+
+
+# -----------------------------
+# LLM (stands in for client.aio.models.generate_content[_stream])
+# -----------------------------
+def _reply_json(contents: str) -> str:
+    # Same key order as the real reply schema (prompts.REPLY_KEYS)
+    return json.dumps({
+        "content_type": "safe",
+        "emotion": random.choice(["neutral", "happy", "sad", "anxious"]),
+        "intensity": round(random.uniform(0.2, 0.9), 2),
+        "gesture": random.choice(["none", "nod", "wave", "thinking"]),
+        "reply_text": f"(offline reply, {len(contents)} prompt chars) I hear you. Tell me more about that.",
+    })
+
+
+async def generate_content(model: str, contents: str, config=None):
+    await PROVIDERS["llm"].wait()
+    # Calls without a config are plain-text (remote language detection)
+    text = _reply_json(contents) if config is not None else "English"
+    return SimpleNamespace(text=text, usage_metadata=None)
+
+
+async def generate_content_stream(model: str, contents: str, config=None):
+    # Time to first token is the sampled latency; the rest trickles out
+    await PROVIDERS["llm"].wait()
+    text = _reply_json(contents) if config is not None else "English"
+
+    async def chunks():
+        for start in range(0, len(text), 24):
+            await asyncio.sleep(0.01)
+            yield SimpleNamespace(text=text[start:start + 24], usage_metadata=None)
+
+    return chunks()
+
+
+# -----------------------------
+# TTS
+# -----------------------------
+# One silent MPEG-1 Layer III frame (128 kbps, 44.1 kHz, ~26 ms)
+_SILENT_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+async def synthesize(text: str) -> bytes:
+    await PROVIDERS["tts"].wait()
+    # Roughly 15 characters of speech per second, like a real voice
+    seconds = max(1.0, len(text) / 15.0)
+    return _SILENT_FRAME * int(seconds / 0.026)
@@ -10,8 +10,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from fastapi import FastAPI, WebSocket, Body
 from fastapi.middleware.cors import CORSMiddleware
-from stt import router as stt_router
-from tts import router as tts_router
+from fastapi.responses import PlainTextResponse
+from backend import metrics
+from backend.stt import router as stt_router
+from backend.tts import router as tts_router
 from ai_backend.speech_chat import router as speech_chat_router
 from ai_backend.rag import router as rag_router
 from auth.router import router as auth_router
@@ -27,6 +29,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage Server-Timing headers + request duration histograms
+app.add_middleware(metrics.ServerTimingMiddleware)
+
 app.include_router(stt_router)
 app.include_router(tts_router)
 app.include_router(speech_chat_router)
@@ -110,6 +115,10 @@ def attention_status():
         return {"status": "NO_FACE"}
     return {"status": camera.get_status()}
 
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"status": "ok"}
\ No newline at end of file
@@ -0,0 +1,227 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Lightweight instrumentation: counters, histograms and per-stage timers,
+# rendered in the Prometheus text format at /metrics (no client library).
+#
+#   with stage("stt"):
+#       transcript = ...
+#
+# records mirage_stage_seconds{stage="stt"} and, inside an HTTP request
+# wrapped by ServerTimingMiddleware, adds "stt;dur=..." to the response's
+# Server-Timing header.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for k, v in items
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            idx = bisect_left(self.buckets, value)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+# -----------------------------
+# Registry
+# -----------------------------
+_metrics: List = []
+_collectors: Dict[str, Callable[[], Dict]] = {}
+
+
+def counter(name: str, help: str) -> Counter:
+    metric = Counter(name, help)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name: str, help: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    metric = Histogram(name, help, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(prefix: str, fn: Callable[[], Dict]) -> None:
+    """
+    Export an existing stats() dict as gauges: numeric leaves become
+    mirage_<prefix>_<path> (nested keys joined with "_"), everything else is skipped.
+    """
+    _collectors[prefix] = fn
+
+
+def _flatten(prefix: str, value, out: List[Tuple[str, float]]) -> None:
+    if isinstance(value, bool):
+        out.append((prefix, float(value)))
+    elif isinstance(value, (int, float)):
+        out.append((prefix, float(value)))
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            name = "".join(c if c.isalnum() else "_" for c in str(k))
+            _flatten(f"{prefix}_{name}", v, out)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for prefix, fn in _collectors.items():
+        samples: List[Tuple[str, float]] = []
+        try:
+            _flatten(f"mirage_{prefix}", fn(), samples)
+        except Exception as e:
+            print(f"[METRICS] collector {prefix} failed: {e}")
+            continue
+        for name, value in samples:
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# Stage timers
+# -----------------------------
+STAGE_SECONDS = histogram("mirage_stage_seconds", "Time spent per pipeline stage")
+STAGE_ERRORS = counter("mirage_stage_errors_total", "Pipeline stages that raised")
+HTTP_SECONDS = histogram("mirage_http_request_seconds", "HTTP request duration until the response starts")
+
+# (stage, ms) entries for the current request; None outside ServerTimingMiddleware
+_request_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def stage(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed * 1000.0))
+
+
+def request_timings() -> Dict[str, float]:
+    """
+    Milliseconds per stage so far in the current request (repeated stages summed).
+    """
+    timings: Dict[str, float] = {}
+    for name, ms in _request_stages.get() or ():
+        timings[name] = timings.get(name, 0.0) + ms
+    return timings
+
+
+def _server_timing(stages: List[Tuple[str, float]], total_ms: float) -> str:
+    parts = [f"{name};dur={ms:.1f}" for name, ms in stages]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware (does not buffer streaming bodies): collects the
+    stages timed during a request into a Server-Timing header and records
+    the request duration per route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: List[Tuple[str, float]] = []
+        token = _request_stages.set(stages)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - start
+                route = scope.get("route")
+                HTTP_SECONDS.observe(
+                    elapsed,
+                    route=getattr(route, "path", "unmatched"),  # templates, not raw paths
+                    method=scope["method"],
+                    status=str(message["status"]),
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(stages, elapsed * 1000.0).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stages.reset(token)
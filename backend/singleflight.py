@@ -0,0 +1,51 @@
+import asyncio
+from typing import Dict, Hashable
+
+# Single-flight: concurrent callers asking for the same key share one
+# in-flight call instead of each hitting the upstream API (frontend retries,
+# several tabs sending the same audio/text).
+# The shared call runs as its own task, so a caller that disconnects and is
+# cancelled does not cancel the work the other callers are waiting on.
+# Results are shared objects; callers must not mutate them.
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
+
+    async def do(self, key: Hashable, fn, *args, **kwargs):
+        """
+        Return await fn(*args, **kwargs), joining an identical call already in flight.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = task
+            task.add_done_callback(lambda t, key=key: self._done(key, t))
+        else:
+            self.shared += 1
+            print(f"[SINGLEFLIGHT] {self.name}: joined in-flight call")
+        return await asyncio.shield(task)
+
+    def in_flight(self, key: Hashable) -> bool:
+        """
+        True when do(key, ...) would join instead of calling fn.
+        """
+        return key in self._calls
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._calls),
+        }
@@ -154,42 +154,497 @@
     
     # return file_path
 
-from groq import Groq
-from fastapi import APIRouter, UploadFile, File
-import tempfile
+from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.websockets import WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import io
+import json
 import os
+import tempfile
+import time
+import zipfile
 from dotenv import load_dotenv
+
+from ai_backend.llm_gateway import GatewayOverloaded, LLMDeadlineExceeded, http_error
+from backend import audio, metrics, vad
+from backend.metrics import stage
+from backend.singleflight import SingleFlight
+from backend.stt_providers import GroqSTTProvider, LocalWhisperProvider, provider_from_env
+from backend.stt_stream import StreamSession, wav_file
+
 load_dotenv()
-def transcribe_with_groq(GROQ_API_KEY, audio_filepath, stt_model):
-    
-    client = Groq(api_key = GROQ_API_KEY)
 
-    filename = audio_filepath 
+# STT_ENGINE=groq: pooled Groq clients shared by every request
+# STT_ENGINE=local: faster-whisper worker processes (see stt_providers.py)
+STT_ENGINE = os.getenv("STT_ENGINE", "groq").lower()
+stt_provider = provider_from_env(STT_ENGINE)
 
-    with open(filename, "rb") as file:
-        transcription = client.audio.transcriptions.create(
-        file=file, 
-        model=stt_model, 
-        language="en",  
-        )
-        
-        return transcription.text
+def transcribe_with_groq(GROQ_API_KEY, audio_filepath, stt_model):
+    with open(audio_filepath, "rb") as file:
+        return transcribe_upload(GROQ_API_KEY, os.path.basename(audio_filepath), file, stt_model)
+
+def transcribe_upload(GROQ_API_KEY, filename: str, file: BinaryIO, stt_model: str) -> str:
+    """
+    Blocking: send an open binary file (e.g. UploadFile.file) to Groq as-is;
+    the multipart body is streamed from it, no copy in memory or on disk.
+    """
+    provider = stt_provider
+    if STT_ENGINE == "groq" and GROQ_API_KEY != stt_provider.api_key:
+        provider = GroqSTTProvider(GROQ_API_KEY)
+    return provider.transcribe_sync(filename, file, stt_model)
 
 # audio_recording()
 # file_path = "recording.wav"
 # transcription = transcribe_with_groq(GROQ_API_KEY, file_path, "whisper-large-v3")
 # print(transcription)
 
-router = APIRouter()
 GROQ_API_KEY=os.environ.get("GROQ_API_KEY")
+STT_MODEL = "whisper-large-v3"
+
+# Upload limits, checked in one chunked pass over the spooled upload
+STT_MAX_UPLOAD_BYTES = int(float(os.getenv("STT_MAX_UPLOAD_MB", "25")) * 1024 * 1024)
+STT_MAX_SECONDS = float(os.getenv("STT_MAX_SECONDS", "120"))
+_READ_CHUNK = 64 * 1024
+
+# Identical audio uploaded concurrently (retries, several tabs) is transcribed once
+_STT_FLIGHT = SingleFlight("stt")
+
+# Preprocessing before upload, in its own small worker pool:
+# decode -> 16 kHz mono -> voice activity detection -> FLAC/Opus.
+# Silence is cut and clips without speech never reach the provider.
+STT_PREPROCESS = os.getenv("STT_PREPROCESS", "1") == "1"
+STT_SAMPLE_RATE = 16000
+STT_UPLOAD_CODEC = os.getenv("STT_UPLOAD_CODEC", "flac")  # flac | opus | wav
+STT_VAD = os.getenv("STT_VAD", "1") == "1"
+STT_VAD_PAD_MS = int(os.getenv("STT_VAD_PAD_MS", "200"))
+STT_VAD_MIN_SPEECH_MS = int(os.getenv("STT_VAD_MIN_SPEECH_MS", "250"))
+_preprocess_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("STT_PREPROCESS_WORKERS", "2")), thread_name_prefix="stt-preprocess"
+)
+vad_stats = {"clips": 0, "empty": 0, "input_seconds": 0.0, "trimmed_seconds": 0.0}
+preprocess_stats = {"requests": 0, "undecodable": 0, "bytes_in": 0, "bytes_out": 0, "ms_total": 0.0}
+
+def _wav_format(head: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (offset of the sample data, bytes per second) for a RIFF/WAVE header, else None.
+    """
+    if len(head) < 12 or head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+        return None
+    pos, byte_rate = 12, None
+    while pos + 8 <= len(head):
+        chunk_id = head[pos:pos + 4]
+        size = int.from_bytes(head[pos + 4:pos + 8], "little")
+        if chunk_id == b"fmt " and pos + 20 <= len(head):
+            byte_rate = int.from_bytes(head[pos + 16:pos + 20], "little")
+        elif chunk_id == b"data":
+            return (pos + 8, byte_rate) if byte_rate else None
+        pos += 8 + size + (size & 1)
+    return None
+
+def _inspect_upload(file: BinaryIO) -> str:
+    """
+    Hash the upload for single-flight while enforcing the size limit and,
+    for WAV, the duration limit; stops reading as soon as one is exceeded.
+    Rewinds the file so it can be streamed to the provider.
+    """
+    file.seek(0)
+    digest = hashlib.sha256()
+    limit, reason = STT_MAX_UPLOAD_BYTES, f"larger than {STT_MAX_UPLOAD_BYTES // (1024 * 1024)} MB"
+    size = 0
+    for chunk in iter(lambda: file.read(_READ_CHUNK), b""):
+        if size == 0:
+            wav = _wav_format(chunk)
+            if wav and wav[0] + int(wav[1] * STT_MAX_SECONDS) < limit:
+                limit, reason = wav[0] + int(wav[1] * STT_MAX_SECONDS), f"longer than {STT_MAX_SECONDS:g} s"
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail=f"Audio is {reason}.")
+        digest.update(chunk)
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Audio upload is empty.")
+    file.seek(0)
+    return digest.hexdigest()
+
+def _trim(samples, report: Dict):
+    samples, vad_report = vad.trim_silence(
+        samples, STT_SAMPLE_RATE, pad_ms=STT_VAD_PAD_MS, min_speech_ms=STT_VAD_MIN_SPEECH_MS
+    )
+    vad_stats["clips"] += 1
+    vad_stats["empty"] += int(vad_report["empty"])
+    vad_stats["input_seconds"] += vad_report["input_seconds"]
+    vad_stats["trimmed_seconds"] += vad_report["trimmed_seconds"]
+    report["empty"] = vad_report["empty"]
+    report["trimmed_seconds"] = vad_report["trimmed_seconds"]
+    return samples
+
+def _preprocess(file: BinaryIO) -> Dict:
+    """
+    Decode, resample to 16 kHz mono, trim silence (STT_VAD) and re-encode.
+    report["upload"] is (filename, bytes) to send instead of the original,
+    or None to send the original (undecodable, or re-encoding did not help).
+    """
+    start = time.perf_counter()
+    bytes_in = file.seek(0, os.SEEK_END)
+    file.seek(0)
+    report = {"upload": None, "empty": False, "bytes_in": bytes_in, "bytes_out": bytes_in, "trimmed_seconds": 0.0}
+    try:
+        samples, rate = audio.decode(file)
+    except audio.AudioDecodeError as e:
+        preprocess_stats["undecodable"] += 1
+        print(f"[STT PREPROCESS] sending upload as-is: {e}")
+        return report
+
+    samples = audio.resample(samples, rate, STT_SAMPLE_RATE)
+    if STT_VAD:
+        samples = _trim(samples, report)
+    if report["empty"]:
+        report["bytes_out"] = 0
+    else:
+        filename, data, codec = audio.encode(samples, STT_SAMPLE_RATE, STT_UPLOAD_CODEC)
+        # Already-compact uploads (short webm/opus) can beat the re-encode
+        if len(data) < bytes_in:
+            report["upload"] = (filename, data)
+            report["bytes_out"] = len(data)
+
+    report["ms"] = (time.perf_counter() - start) * 1000.0
+    preprocess_stats["requests"] += 1
+    preprocess_stats["bytes_in"] += report["bytes_in"]
+    preprocess_stats["bytes_out"] += report["bytes_out"]
+    preprocess_stats["ms_total"] += report["ms"]
+    print(
+        f"[STT PREPROCESS] {report['bytes_in']} -> {report['bytes_out']} bytes, "
+        f"{report['trimmed_seconds']:.2f}s silence trimmed, {report['ms']:.1f} ms"
+    )
+    return report
+
+async def _transcribe_spooled(filename: str, file: BinaryIO, stt_model: str) -> str:
+    upload = file
+    if STT_PREPROCESS:
+        with stage("stt_preprocess"):
+            loop = asyncio.get_running_loop()
+            report = await loop.run_in_executor(_preprocess_pool, _preprocess, file)
+        if report["empty"]:
+            return ""
+        if report["upload"] is not None:
+            filename, data = report["upload"]
+            upload = io.BytesIO(data)
+    with stage("stt_provider"):
+        return await stt_provider.transcribe(filename, upload, stt_model)
+
+async def _transcribe_owned(filename: str, file: BinaryIO, stt_model: str) -> str:
+    try:
+        return await _transcribe_spooled(filename, file, stt_model)
+    finally:
+        file.close()
+
+async def _transcribe_flight(digest: str, filename: str, file: BinaryIO, stt_model: str) -> str:
+    """
+    Single-flight transcription; takes ownership of `file`. The flight task
+    closes it when this call starts one, a joiner closes it at once.
+    """
+    key = (digest, stt_model)
+    if _STT_FLIGHT.in_flight(key):
+        file.close()
+    return await _STT_FLIGHT.do(key, _transcribe_owned, filename, file, stt_model)
+
+async def transcribe_upload_file(file: UploadFile, stt_model: str = STT_MODEL) -> str:
+    """
+    Transcribe an UploadFile (silence trimmed first when it decodes), keyed
+    by content hash for single-flight.
+    Returns "" without calling the provider when there is no speech.
+    The spooled file is taken over (the flight may outlive this request);
+    the caller still closes the UploadFile as usual.
+    """
+    owned, file.file = file.file, io.BytesIO()
+    try:
+        with stage("stt_inspect"):
+            digest = await run_in_threadpool(_inspect_upload, owned)
+    except BaseException:
+        owned.close()
+        raise
+    try:
+        return await _transcribe_flight(digest, file.filename or "audio.wav", owned, stt_model)
+    except (GatewayOverloaded, LLMDeadlineExceeded) as e:
+        raise http_error(e)
+
+# /stt-stream: 16 kHz mono PCM16 in, {"text", "is_final", "segment"} out.
+# STT_STREAM_ENGINE picks its provider separately (e.g. local workers for
+# live audio, Groq for uploads); by default it shares stt_provider.
+STT_STREAM_ENGINE = os.getenv("STT_STREAM_ENGINE", STT_ENGINE).lower()
+stream_provider = stt_provider if STT_STREAM_ENGINE == STT_ENGINE else provider_from_env(STT_STREAM_ENGINE)
+STT_STREAM_SAMPLE_RATE = 16000
+STT_STREAM_PARTIAL_SECONDS = float(os.getenv("STT_STREAM_PARTIAL_SECONDS", "1.0"))
+STT_STREAM_END_SILENCE_MS = int(os.getenv("STT_STREAM_END_SILENCE_MS", "600"))
+STT_STREAM_MAX_SEGMENT_SECONDS = float(os.getenv("STT_STREAM_MAX_SEGMENT_SECONDS", "15"))
+stream_stats = {"connections": 0, "active": 0, "segments": 0, "partials": 0, "partials_skipped": 0, "audio_seconds": 0.0}
+
+async def _transcribe_stream_segment(samples) -> str:
+    with stage("stt_stream"):
+        return await stream_provider.transcribe("audio.wav", wav_file(samples, STT_STREAM_SAMPLE_RATE), STT_MODEL)
+
+# /stt/batch: many files and/or .zip archives, transcribed concurrently,
+# one NDJSON line per file as it finishes. Identical clips (same SHA-256)
+# are transcribed once per batch; the single-flight above also joins them
+# with concurrent /stt calls. STT_BATCH_CONCURRENCY bounds one batch, the
+# provider gateway still bounds the process.
+STT_BATCH_CONCURRENCY = int(os.getenv("STT_BATCH_CONCURRENCY", "4"))
+STT_BATCH_MAX_FILES = int(os.getenv("STT_BATCH_MAX_FILES", "100"))
+batch_stats = {"requests": 0, "files": 0, "duplicates": 0, "errors": 0}
+
+def _too_many_files():
+    return HTTPException(status_code=413, detail=f"More than {STT_BATCH_MAX_FILES} files in the batch.")
+
+def _expand_archive(archive: BinaryIO, prefix: str, limit: int) -> List[Tuple[str, BinaryIO]]:
+    """
+    Copy each member of a zip into its own spooled file, checking the
+    per-file size limit as it goes (declared sizes can lie).
+    """
+    members = []
+    try:
+        with zipfile.ZipFile(archive) as zf:
+            infos = [
+                i for i in zf.infolist()
+                if not i.is_dir() and not i.filename.startswith("__MACOSX/")
+                and not os.path.basename(i.filename).startswith(".")
+            ]
+            if len(infos) > limit:
+                raise _too_many_files()
+            for info in infos:
+                name = f"{prefix}/{info.filename}"
+                out = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+                members.append((name, out))
+                with zf.open(info) as src:
+                    size = 0
+                    for chunk in iter(lambda: src.read(_READ_CHUNK), b""):
+                        size += len(chunk)
+                        if size > STT_MAX_UPLOAD_BYTES:
+                            raise HTTPException(
+                                status_code=413,
+                                detail=f"{name} is larger than {STT_MAX_UPLOAD_BYTES // (1024 * 1024)} MB.",
+                            )
+                        out.write(chunk)
+                out.seek(0)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, RuntimeError) as e:  # RuntimeError: encrypted member
+        for _, f in members:
+            f.close()
+        raise HTTPException(status_code=400, detail=f"Could not read archive {prefix}: {e}")
+    except HTTPException:
+        for _, f in members:
+            f.close()
+        raise
+    return members
+
+def _batch_items(files: List[Tuple[str, BinaryIO]]) -> List[Tuple[str, BinaryIO]]:
+    """
+    Uploads with archives replaced by their members. Closes everything on error.
+    """
+    items = []
+    try:
+        for name, f in files:
+            f.seek(0)
+            if zipfile.is_zipfile(f):
+                items.extend(_expand_archive(f, name, STT_BATCH_MAX_FILES - len(items)))
+                f.close()
+            else:
+                f.seek(0)
+                items.append((name, f))
+            if len(items) > STT_BATCH_MAX_FILES:
+                raise _too_many_files()
+    except HTTPException:
+        for _, f in items + files:
+            f.close()
+        raise
+    return items
+
+async def _transcribe_batch(items: List[Tuple[str, BinaryIO]], stt_model: str):
+    """
+    Yields NDJSON lines in completion order, then a summary line.
+    Every file is closed: a unique clip's file is handed to the
+    single-flight call (which closes it when done, even if the client has
+    gone), the others are closed here.
+    """
+    started = time.perf_counter()
+    limit = asyncio.Semaphore(max(1, STT_BATCH_CONCURRENCY))
+    firsts: Dict[str, Tuple[int, asyncio.Task]] = {}
+    handed_over = set()
+    lines: asyncio.Queue = asyncio.Queue()
+    summary = {"done": True, "files": len(items), "transcribed": 0, "duplicates": 0, "errors": 0}
+
+    async def transcribe_unique(filename: str, file: BinaryIO, digest: str) -> str:
+        try:
+            await limit.acquire()
+        except BaseException:
+            file.close()  # cancelled before the flight took the file
+            raise
+        try:
+            return await _transcribe_flight(digest, filename, file, stt_model)
+        finally:
+            limit.release()
+
+    async def run(index: int, filename: str, file: BinaryIO):
+        line = {"index": index, "filename": filename}
+        item_started = time.perf_counter()
+        try:
+            async with limit:
+                line["sha256"] = digest = await run_in_threadpool(_inspect_upload, file)
+            if digest in firsts:
+                line["duplicate_of"], task = firsts[digest]
+                summary["duplicates"] += 1
+            else:
+                handed_over.add(index)
+                task = asyncio.ensure_future(transcribe_unique(filename, file, digest))
+                firsts[digest] = (index, task)
+            line["transcription"] = await asyncio.shield(task)
+            summary["transcribed"] += 1
+        except (GatewayOverloaded, LLMDeadlineExceeded) as e:
+            error = http_error(e)
+            line.update(error=error.detail, status=error.status_code)
+        except HTTPException as e:
+            line.update(error=e.detail, status=e.status_code)
+        except Exception as e:
+            print(f"[STT BATCH] {filename} failed: {e!r}")
+            line.update(error=str(e) or type(e).__name__, status=502)
+        if "error" in line:
+            summary["errors"] += 1
+        line["ms"] = round((time.perf_counter() - item_started) * 1000.0, 1)
+        await lines.put(line)
+
+    tasks = [asyncio.ensure_future(run(i, name, f)) for i, (name, f) in enumerate(items)]
+    try:
+        for _ in tasks:
+            yield json.dumps(await lines.get(), ensure_ascii=False) + "\n"
+        summary["ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        print(
+            f"[STT BATCH] {summary['files']} files, {summary['duplicates']} duplicates, "
+            f"{summary['errors']} errors in {summary['ms']:.0f} ms"
+        )
+        yield json.dumps(summary) + "\n"
+    finally:
+        # Client gone: stop waiting. Flights already started keep their
+        # files (and may be shared with /stt callers) and close them.
+        unique = [task for _, task in firsts.values()]
+        for task in tasks + unique:
+            task.cancel()
+        await asyncio.gather(*tasks, *unique, return_exceptions=True)
+        for index, (_, f) in enumerate(items):
+            if index not in handed_over:
+                f.close()
+        batch_stats["files"] += summary["files"]
+        batch_stats["duplicates"] += summary["duplicates"]
+        batch_stats["errors"] += summary["errors"]
+
+def stt_stats():
+    return {
+        "provider": stt_provider.stats(),
+        "singleflight": _STT_FLIGHT.stats(),
+        "preprocess": preprocess_stats,
+        "vad": vad_stats,
+        "stream": {**stream_stats, "engine": STT_STREAM_ENGINE},
+        "batch": batch_stats,
+    }
+
+metrics.register_collector("stt", stt_stats)
+
+router = APIRouter()
+
+@router.on_event("startup")
+async def _warm_stt_provider():
+    for provider in {id(p): p for p in (stt_provider, stream_provider)}.values():
+        if isinstance(provider, LocalWhisperProvider):
+            await provider.warm()
+
+@router.on_event("shutdown")
+async def _close_stt_provider():
+    await stt_provider.aclose()
+    if stream_provider is not stt_provider:
+        await stream_provider.aclose()
+    _preprocess_pool.shutdown(wait=False)
+
+@router.get("/stt/stats")
+def stt_stats_endpoint():
+    return stt_stats()
+
 @router.post("/stt")
 async def stt_file(file: UploadFile = File(...)):
-    # save temp audio
-    suffix = os.path.splitext(file.filename)[1] or ".wav"
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(await file.read())
-        tmp_path = tmp.name
-
-    transcription = transcribe_with_groq(GROQ_API_KEY, tmp_path, "whisper-large-v3")
-    os.remove(tmp_path)
-    return {"transcription": transcription}
\ No newline at end of file
+    try:
+        transcription = await transcribe_upload_file(file)
+    finally:
+        await file.close()
+    return {"transcription": transcription}
+
+@router.post("/stt/batch")
+async def stt_batch(files: List[UploadFile] = File(...)):
+    """
+    Audio files and/or .zip archives of them. Streams one JSON line per
+    file as it finishes ({index, filename, sha256, transcription} or
+    {index, filename, error, status}; duplicate_of for repeated clips),
+    then {"done": true, ...} with the totals.
+    """
+    # The form (and its files) is closed when this returns, before the
+    # body is streamed, so the spooled files are taken over here
+    owned = []
+    for upload in files:
+        owned.append((upload.filename or f"file{len(owned)}", upload.file))
+        upload.file = io.BytesIO()
+    items = await run_in_threadpool(_batch_items, owned)
+    batch_stats["requests"] += 1
+    return StreamingResponse(
+        _transcribe_batch(items, STT_MODEL),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/stt-stream")
+async def stt_stream(ws: WebSocket):
+    await ws.accept()
+    send_lock = asyncio.Lock()
+    connected = True
+
+    async def send(message):
+        nonlocal connected
+        if not connected:
+            return
+        async with send_lock:
+            try:
+                await ws.send_json(message)
+            except Exception:  # closed by the client while we were transcribing
+                connected = False
+
+    session = StreamSession(
+        _transcribe_stream_segment,
+        send,
+        sample_rate=STT_STREAM_SAMPLE_RATE,
+        partial_interval_seconds=STT_STREAM_PARTIAL_SECONDS,
+        pad_ms=STT_VAD_PAD_MS,
+        min_speech_ms=STT_VAD_MIN_SPEECH_MS,
+        end_silence_ms=STT_STREAM_END_SILENCE_MS,
+        max_segment_seconds=STT_STREAM_MAX_SEGMENT_SECONDS,
+    )
+    stream_stats["connections"] += 1
+    stream_stats["active"] += 1
+    try:
+        while True:
+            session.feed_pcm16(await ws.receive_bytes())
+    except WebSocketDisconnect:
+        connected = False
+        print("[STT STREAM] client disconnected")
+    except Exception as e:
+        print(f"[STT STREAM] error: {e!r}")
+    finally:
+        try:
+            if connected:
+                await session.finish()  # last utterance, then close
+                await ws.close()
+        except Exception:
+            pass
+        finally:
+            # Nobody is left to receive results still in flight
+            session.cancel()
+            stream_stats["active"] -= 1
+            for key in ("segments", "partials", "partials_skipped", "audio_seconds"):
+                stream_stats[key] += session.stats[key]
@@ -0,0 +1,310 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Optional
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+from groq import APIConnectionError, AsyncGroq, Groq
+
+from ai_backend.llm_gateway import LLMGateway
+from backend import fake_providers, whisper_worker
+
+# Long-lived Groq clients for transcription.
+# Building Groq(api_key=...) per call meant a new connection pool, and a new
+# TCP + TLS handshake, on every request. Here one pooled httpx client per
+# sync/async path is kept for the process, and async calls go through the
+# same gateway as Gemini: a concurrency cap with a bounded wait queue,
+# retries on 429/5xx/connection errors, and a per-request deadline.
+# A trace hook on every request counts new connections and TLS handshake
+# time, so connection reuse is visible in stats().
+
+
+class ConnectionStats:
+    """
+    Fed by httpcore trace events: a request that opens a TCP connection did
+    not reuse a pooled one.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.connects = 0
+        self.connect_ms_total = 0.0
+        self.tls_handshakes = 0
+        self.tls_ms_total = 0.0
+        self.tls_ms_max = 0.0
+
+    def _trace(self, started: Dict[str, float], event: str) -> None:
+        now = time.perf_counter()
+        step, _, phase = event.rpartition(".")
+        if phase == "started":
+            started[step] = now
+            return
+        if phase != "complete" or step not in started:
+            return
+        ms = (now - started.pop(step)) * 1000.0
+        if step == "connection.connect_tcp":
+            self.connects += 1
+            self.connect_ms_total += ms
+        elif step == "connection.start_tls":
+            self.tls_handshakes += 1
+            self.tls_ms_total += ms
+            self.tls_ms_max = max(self.tls_ms_max, ms)
+
+    def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        started: Dict[str, float] = {}
+        request.extensions["trace"] = lambda event, info: self._trace(started, event)
+
+    async def on_request_async(self, request: httpx.Request) -> None:
+        self.requests += 1
+        started: Dict[str, float] = {}
+
+        async def trace(event, info):
+            self._trace(started, event)
+
+        request.extensions["trace"] = trace
+
+    def stats(self) -> Dict:
+        reused = self.requests - self.connects
+        return {
+            "requests": self.requests,
+            "new_connections": self.connects,
+            "reuse_rate": reused / self.requests if self.requests else 0.0,
+            "connect_ms_avg": self.connect_ms_total / self.connects if self.connects else 0.0,
+            "tls_handshakes": self.tls_handshakes,
+            "tls_ms_avg": self.tls_ms_total / self.tls_handshakes if self.tls_handshakes else 0.0,
+            "tls_ms_max": self.tls_ms_max,
+        }
+
+
+class GroqSTTProvider:
+    def __init__(
+        self,
+        api_key: Optional[str],
+        max_in_flight: int = 4,
+        max_queue: int = 16,
+        deadline_seconds: float = 30.0,
+        max_retries: int = 2,
+        keepalive_seconds: float = 60.0,
+    ):
+        self.api_key = api_key
+        self.deadline_seconds = deadline_seconds
+        self.gateway = LLMGateway(
+            max_in_flight=max_in_flight,
+            max_queue=max_queue,
+            deadline_seconds=deadline_seconds,
+            max_retries=max_retries,
+            name="STT",
+            retry_exceptions=(APIConnectionError,),
+        )
+        # One keep-alive connection per concurrent call is enough
+        self._limits = httpx.Limits(
+            max_connections=max_in_flight,
+            max_keepalive_connections=max_in_flight,
+            keepalive_expiry=keepalive_seconds,
+        )
+        self._timeout = httpx.Timeout(deadline_seconds, connect=5.0)
+        self.connections = ConnectionStats()
+        self._client: Optional[Groq] = None
+        self._async_client: Optional[AsyncGroq] = None
+
+    def _sync_client(self) -> Groq:
+        if self._client is None:
+            http_client = httpx.Client(
+                limits=self._limits,
+                timeout=self._timeout,
+                event_hooks={"request": [self.connections.on_request]},
+            )
+            # Retries are ours (gateway / caller), not the SDK's
+            self._client = Groq(api_key=self.api_key, http_client=http_client, max_retries=0)
+        return self._client
+
+    def _aclient(self) -> AsyncGroq:
+        # Created lazily so the pool belongs to the serving event loop
+        if self._async_client is None:
+            http_client = httpx.AsyncClient(
+                limits=self._limits,
+                timeout=self._timeout,
+                event_hooks={"request": [self.connections.on_request_async]},
+            )
+            self._async_client = AsyncGroq(api_key=self.api_key, http_client=http_client, max_retries=0)
+        return self._async_client
+
+    def transcribe_sync(self, filename: str, file: BinaryIO, model: str) -> str:
+        """
+        Blocking call on the pooled sync client (scripts, threadpool callers).
+        """
+        if fake_providers.enabled("stt"):
+            return fake_providers.transcribe(file)
+        transcription = self._sync_client().audio.transcriptions.create(
+            file=(filename, file),
+            model=model,
+            language="en",
+        )
+        return transcription.text
+
+    async def _attempt(self, filename: str, file: BinaryIO, model: str) -> str:
+        file.seek(0)  # a retry re-sends the body from the start
+        if fake_providers.enabled("stt"):
+            return await run_in_threadpool(fake_providers.transcribe, file)
+        transcription = await self._aclient().audio.transcriptions.create(
+            file=(filename, file),
+            model=model,
+            language="en",
+        )
+        return transcription.text
+
+    async def transcribe(self, filename: str, file: BinaryIO, model: str, deadline: Optional[float] = None) -> str:
+        """
+        Async transcription under the concurrency cap, retries and deadline.
+        Raises GatewayOverloaded / LLMDeadlineExceeded like the LLM gateway.
+        """
+        return await self.gateway.call(self._attempt, filename, file, model, deadline=deadline)
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def stats(self) -> Dict:
+        return {"gateway": self.gateway.stats(), "connections": self.connections.stats()}
+
+
+def groq_provider_from_env() -> GroqSTTProvider:
+    return GroqSTTProvider(
+        os.environ.get("GROQ_API_KEY"),
+        max_in_flight=int(os.getenv("STT_MAX_IN_FLIGHT", "4")),
+        max_queue=int(os.getenv("STT_MAX_QUEUE", "16")),
+        deadline_seconds=float(os.getenv("STT_DEADLINE_SECONDS", "30")),
+        max_retries=int(os.getenv("STT_MAX_RETRIES", "2")),
+        keepalive_seconds=float(os.getenv("STT_KEEPALIVE_SECONDS", "60")),
+    )
+
+
+class LocalWhisperProvider:
+    """
+    faster-whisper in a pool of worker processes, each holding a warm model:
+    no GIL contention with the event loop, no network round trip, works
+    offline. A gateway in front (one slot per worker plus a bounded queue)
+    applies the same overload and deadline behaviour as the Groq path.
+    """
+
+    def __init__(
+        self,
+        model_size: str = "base",
+        workers: int = 2,
+        max_queue: int = 16,
+        device: str = "cpu",
+        compute_type: str = "int8",
+        cpu_threads: int = 0,
+        deadline_seconds: float = 60.0,
+        language: str = "en",
+        beam_size: int = 1,
+    ):
+        self.model_size = model_size
+        self.workers = max(1, workers)
+        self.language = language
+        self.beam_size = beam_size
+        self._init_args = (model_size, device, compute_type, cpu_threads or max(1, (os.cpu_count() or 1) // self.workers))
+        self.gateway = LLMGateway(
+            max_in_flight=self.workers,
+            max_queue=max_queue,
+            deadline_seconds=deadline_seconds,
+            max_retries=0,
+            name="LOCAL STT",
+        )
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.audio_seconds = 0.0
+        self.processing_seconds = 0.0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: CTranslate2/OpenMP state does not survive fork safely
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=whisper_worker.init,
+                initargs=self._init_args,
+            )
+        return self._pool
+
+    async def warm(self) -> None:
+        """
+        Start every worker and load its model before the first request.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        pids = await asyncio.gather(*(loop.run_in_executor(pool, whisper_worker.ping) for _ in range(self.workers)))
+        print(f"[LOCAL STT] {len(set(pids))} workers ready ({self.model_size})")
+
+    def _record(self, result) -> str:
+        text, audio_seconds, processing_seconds = result
+        self.audio_seconds += audio_seconds
+        self.processing_seconds += processing_seconds
+        return text
+
+    def transcribe_sync(self, filename: str, file: BinaryIO, model: str) -> str:
+        future = self._executor().submit(whisper_worker.transcribe, file.read(), self.language, self.beam_size)
+        return self._record(future.result())
+
+    async def _attempt(self, file: BinaryIO) -> str:
+        # The clip crosses the process boundary as bytes (one copy, pickled)
+        file.seek(0)
+        audio = file.read()
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            self._executor(), whisper_worker.transcribe, audio, self.language, self.beam_size
+        )
+        return self._record(result)
+
+    async def transcribe(self, filename: str, file: BinaryIO, model: str, deadline: Optional[float] = None) -> str:
+        """
+        `model` names the Groq model and is ignored; the pool's model_size is used.
+        A deadline frees the caller, but the worker finishes the clip it started.
+        """
+        return await self.gateway.call(self._attempt, file, deadline=deadline)
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict:
+        return {
+            "gateway": self.gateway.stats(),
+            "model_size": self.model_size,
+            "workers": self.workers,
+            "audio_seconds": self.audio_seconds,
+            "processing_seconds": self.processing_seconds,
+            # < 1.0 means faster than real time
+            "real_time_factor": self.processing_seconds / self.audio_seconds if self.audio_seconds else 0.0,
+        }
+
+
+def local_provider_from_env() -> LocalWhisperProvider:
+    return LocalWhisperProvider(
+        model_size=os.getenv("STT_LOCAL_MODEL", "base"),
+        workers=int(os.getenv("STT_LOCAL_WORKERS", "2")),
+        max_queue=int(os.getenv("STT_LOCAL_MAX_QUEUE", "16")),
+        device=os.getenv("STT_LOCAL_DEVICE", "cpu"),
+        compute_type=os.getenv("STT_LOCAL_COMPUTE_TYPE", "int8"),
+        cpu_threads=int(os.getenv("STT_LOCAL_CPU_THREADS", "0")),
+        deadline_seconds=float(os.getenv("STT_LOCAL_DEADLINE_SECONDS", "60")),
+    )
+
+
+def provider_from_env(engine: str):
+    """
+    STT_ENGINE=groq (default) or local.
+    """
+    if engine == "local":
+        return local_provider_from_env()
+    if engine != "groq":
+        raise ValueError(f"Unknown STT_ENGINE {engine!r} (expected groq or local)")
+    return groq_provider_from_env()
@@ -0,0 +1,244 @@
+import asyncio
+import io
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from backend import audio, vad
+
+# Live transcription over a WebSocket.
+#   - PCM16 chunks go straight into a preallocated float32 ring buffer (no
+#     Python lists, no reallocation per chunk)
+#   - a streaming VAD splits the audio into utterances: a segment starts at
+#     the first speech frame (minus padding) and ends after a pause, or when
+#     it reaches max_segment_seconds
+#   - while a segment is open, the audio so far is re-transcribed every
+#     partial_interval_seconds for a partial result (at most one partial in
+#     flight; intervals that find one running are skipped)
+#   - a closed segment is transcribed once more for its final result
+#   - transcription runs in tasks, so it overlaps with the user speaking;
+#     finals are sent in segment order
+
+
+class RingBuffer:
+    """
+    Fixed-size float32 ring addressed by absolute sample index: samples
+    [total - capacity, total) are readable.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self.total = 0
+
+    def write(self, samples: np.ndarray) -> None:
+        n = len(samples)
+        if n >= self.capacity:
+            samples, self.total = samples[-self.capacity:], self.total + n - self.capacity
+            n = self.capacity
+        start = self.total % self.capacity
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = samples[:first]
+        self._data[:n - first] = samples[first:]
+        self.total += n
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """
+        Copy of samples [start, end), clamped to what is still buffered.
+        """
+        start = max(start, self.total - self.capacity, 0)
+        end = min(end, self.total)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        i = start % self.capacity
+        if i + end - start <= self.capacity:
+            return self._data[i:i + end - start].copy()
+        return np.concatenate((self._data[i:], self._data[:end % self.capacity]))
+
+
+class Segmenter:
+    """
+    Turns frame-level VAD decisions into utterance boundaries (absolute
+    sample indexes into the RingBuffer).
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        pad_ms: int = 200,
+        min_speech_ms: int = 250,
+        end_silence_ms: int = 600,
+        max_segment_seconds: float = 15.0,
+    ):
+        self.vad = vad.StreamingVAD(sample_rate)
+        self.frame_len = self.vad.frame_len
+        self.pad = sample_rate * pad_ms // 1000
+        self.min_speech_frames = max(1, min_speech_ms // vad.FRAME_MS)
+        self.end_silence_frames = max(1, end_silence_ms // vad.FRAME_MS)
+        self.max_segment = int(sample_rate * max_segment_seconds)
+        self.start: Optional[int] = None  # open segment
+        self._speech_frames = 0
+        self._silent_frames = 0
+        self._last_speech_end = 0
+        self._pending = np.zeros(0, dtype=np.float32)  # tail shorter than a frame
+        self._position = 0  # absolute index of the next frame
+
+    def feed(self, samples: np.ndarray) -> List[tuple]:
+        """
+        Returns the (start, end, has_speech) segments closed by these samples.
+        has_speech is False when the segment never reached min_speech_ms.
+        """
+        samples = np.concatenate((self._pending, samples)) if len(self._pending) else samples
+        n = len(samples) // self.frame_len
+        self._pending = samples[n * self.frame_len:]
+        mask = self.vad.process(samples[: n * self.frame_len].reshape(n, self.frame_len))
+
+        closed = []
+        for is_speech in mask:
+            frame_start = self._position
+            self._position += self.frame_len
+            if is_speech:
+                if self.start is None:
+                    self.start = max(0, frame_start - self.pad)
+                    self._speech_frames = 0
+                self._speech_frames += 1
+                self._silent_frames = 0
+                self._last_speech_end = self._position
+            elif self.start is not None:
+                self._silent_frames += 1
+                if self._silent_frames >= self.end_silence_frames:
+                    closed.append(self._close(self._last_speech_end + self.pad))
+            if self.start is not None and self._position - self.start >= self.max_segment:
+                closed.append(self._close(self._position))
+        return closed
+
+    def flush(self) -> Optional[tuple]:
+        """
+        Close the open segment at end of stream.
+        """
+        if self.start is None:
+            return None
+        return self._close(self._position + len(self._pending))
+
+    def _close(self, end: int) -> tuple:
+        segment = (self.start, end, self._speech_frames >= self.min_speech_frames)
+        self.start = None
+        self._speech_frames = self._silent_frames = 0
+        return segment
+
+
+class StreamSession:
+    """
+    One WebSocket connection. `transcribe` takes mono float32 samples at
+    sample_rate and returns text; `send` delivers a JSON-able message.
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[np.ndarray], Awaitable[str]],
+        send: Callable[[Dict], Awaitable[None]],
+        sample_rate: int = 16000,
+        buffer_seconds: float = 30.0,
+        partial_interval_seconds: float = 1.0,
+        **segmenter_kwargs,
+    ):
+        self.transcribe = transcribe
+        self.send = send
+        self.sample_rate = sample_rate
+        self.segmenter = Segmenter(sample_rate, **segmenter_kwargs)
+        # Larger than the longest segment, so an open segment is never overwritten
+        capacity = max(int(sample_rate * buffer_seconds), self.segmenter.max_segment + 2 * self.segmenter.pad)
+        self.ring = RingBuffer(capacity)
+        self.partial_interval = int(sample_rate * partial_interval_seconds)
+        self.segment_index = 0
+        self._closed = 0  # segments closed so far, with or without speech
+        self._next_partial = 0
+        self._partial: Optional[asyncio.Task] = None
+        self._last_final: Optional[asyncio.Task] = None
+        self._tasks = set()
+        self._odd = b""  # trailing byte of a chunk that split a sample
+        self.stats = {"segments": 0, "partials": 0, "partials_skipped": 0, "audio_seconds": 0.0}
+
+    def feed_pcm16(self, pcm: bytes) -> None:
+        if self._odd:
+            pcm = self._odd + pcm
+        cut = len(pcm) - len(pcm) % 2
+        self._odd = pcm[cut:]
+        samples = np.frombuffer(pcm[:cut], dtype="<i2").astype(np.float32) / 32768.0
+        self.ring.write(samples)
+        self.stats["audio_seconds"] += len(samples) / self.sample_rate
+        for segment in self.segmenter.feed(samples):
+            self._finalize(*segment)
+        self._maybe_partial()
+
+    async def finish(self) -> None:
+        """
+        Close the open segment and wait for every pending transcription.
+        """
+        segment = self.segmenter.flush()
+        if segment is not None:
+            self._finalize(*segment)
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def cancel(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _maybe_partial(self) -> None:
+        start = self.segmenter.start
+        if start is None or self.ring.total - start < self._next_partial:
+            return
+        self._next_partial = self.ring.total - start + self.partial_interval
+        if self._partial is not None and not self._partial.done():
+            self.stats["partials_skipped"] += 1
+            return
+        self._partial = self._spawn(self._send_partial(self._closed, start, self.ring.total))
+
+    def _finalize(self, start: int, end: int, has_speech: bool) -> None:
+        self._next_partial = 0
+        self._closed += 1
+        if not has_speech:
+            return
+        samples = self.ring.read(start, end)
+        index, self.segment_index = self.segment_index, self.segment_index + 1
+        self.stats["segments"] += 1
+        self._last_final = self._spawn(self._send_final(index, samples, start, end, self._last_final))
+
+    async def _send_partial(self, closed: int, start: int, end: int) -> None:
+        try:
+            text = await self.transcribe(self.ring.read(start, end))
+        except Exception as e:  # the final result will retry the audio
+            print(f"[STT STREAM] partial failed: {e!r}")
+            return
+        # Dropped once the segment is closed and its final result is on its way
+        if text and closed == self._closed:
+            self.stats["partials"] += 1
+            await self.send({"text": text, "is_final": False, "segment": self.segment_index})
+
+    async def _send_final(self, index: int, samples: np.ndarray, start: int, end: int, previous: Optional[asyncio.Task]) -> None:
+        started = time.perf_counter()
+        message = {"text": "", "is_final": True, "segment": index, "start": start / self.sample_rate, "end": end / self.sample_rate}
+        try:
+            message["text"] = await self.transcribe(samples)
+        except Exception as e:
+            print(f"[STT STREAM] segment {index} failed: {e!r}")
+            message["error"] = str(e) or type(e).__name__
+        message["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        await self.send(message)
+
+
+def wav_file(samples: np.ndarray, sample_rate: int) -> io.BytesIO:
+    """
+    Samples as an in-memory WAV file for providers that take uploads.
+    """
+    return io.BytesIO(audio.encode_wav(samples, sample_rate))
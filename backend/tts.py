@@ -122,7 +122,7 @@
 import os
 import time
 import hashlib
-from typing import Optional, Dict, Tuple
+from typing import Optional
 
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
@@ -133,6 +133,11 @@ from dotenv import load_dotenv
 import edge_tts
 from elevenlabs.client import ElevenLabs
 
+from backend import fake_providers, metrics
+from backend.metrics import stage
+from backend.singleflight import SingleFlight
+from backend.tts_cache import TTSCache
+
 # -----------------------------
 # Env + client
 # -----------------------------
@@ -164,17 +169,25 @@ EDGE_VOICE_FEMALE = "en-US-JennyNeural"
 
 # Caching to avoid repeated API calls (huge for stability + avoiding abuse detection)
 CACHE_SECONDS = 15 * 60  # 15 minutes
+CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "64")) * 1024 * 1024)
+CACHE_SWEEP_SECONDS = float(os.getenv("TTS_CACHE_SWEEP_SECONDS", "60"))
 
 # Circuit breaker:
 # if ElevenLabs starts returning 401 unusual_activity, we disable it temporarily
 ELEVEN_COOLDOWN_SECONDS = 10 * 60  # 10 minutes
 
-# In-memory cache: key -> (expires_ts, audio_bytes)
-_TTS_CACHE: Dict[str, Tuple[float, bytes]] = {}
+# In-memory cache: key -> audio bytes, LRU within CACHE_MAX_BYTES
+_TTS_CACHE = TTSCache(CACHE_MAX_BYTES, CACHE_SECONDS, sweep_interval=CACHE_SWEEP_SECONDS)
 
 # Circuit breaker state
 _ELEVEN_DISABLED_UNTIL = 0.0
 
+# Concurrent misses for the same cache key share one generation
+_TTS_FLIGHT = SingleFlight("tts")
+
+_TTS_CACHE_LOOKUPS = metrics.counter("mirage_tts_cache_lookups_total", "TTS cache lookups by result")
+metrics.register_collector("tts_cache", _TTS_CACHE.stats)
+
 
 # -----------------------------
 # Models
@@ -199,18 +212,11 @@ def _cache_key(text: str, gender: str, voice_id: str, model_id: str) -> str:
 
 
 def _cache_get(key: str) -> Optional[bytes]:
-    item = _TTS_CACHE.get(key)
-    if not item:
-        return None
-    exp, val = item
-    if _now() > exp:
-        _TTS_CACHE.pop(key, None)
-        return None
-    return val
+    return _TTS_CACHE.get(key)
 
 
 def _cache_set(key: str, audio_bytes: bytes) -> None:
-    _TTS_CACHE[key] = (_now() + CACHE_SECONDS, audio_bytes)
+    _TTS_CACHE.set(key, audio_bytes)
 
 
 def _eleven_allowed() -> bool:
@@ -284,6 +290,7 @@ async def tts_generate(text: str, gender: str = "female", voice_id: Optional[str
     Robust TTS generation:
       - Uses ElevenLabs if allowed
       - Caches output
+      - Coalesces concurrent misses for the same key
       - Circuit breaker cooldown after 401 unusual activity
       - Falls back to Edge TTS
     """
@@ -294,13 +301,28 @@ async def tts_generate(text: str, gender: str = "female", voice_id: Optional[str
     key = _cache_key(text, gender or "female", voice, model_id or DEFAULT_MODEL_ID)
 
     cached = _cache_get(key)
+    _TTS_CACHE_LOOKUPS.inc(result="hit" if cached else "miss")
     if cached:
         return cached
 
+    return await _TTS_FLIGHT.do(key, _tts_render, key, text, gender, voice, model_id or DEFAULT_MODEL_ID)
+
+
+async def _tts_render(key: str, text: str, gender: str, voice: str, model_id: str) -> bytes:
+    """
+    Cache miss path of tts_generate (one call per key at a time).
+    """
+    if fake_providers.enabled("tts"):
+        with stage("tts_fake"):
+            audio_bytes = await fake_providers.synthesize(text)
+        _cache_set(key, audio_bytes)
+        return audio_bytes
+
     # Try ElevenLabs (threadpool)
     if _eleven_allowed():
         try:
-            audio_bytes = await run_in_threadpool(_elevenlabs_tts_sync, text, voice, model_id or DEFAULT_MODEL_ID)
+            with stage("tts_elevenlabs"):
+                audio_bytes = await run_in_threadpool(_elevenlabs_tts_sync, text, voice, model_id)
             _cache_set(key, audio_bytes)
             return audio_bytes
         except Exception as e:
@@ -310,7 +332,8 @@ async def tts_generate(text: str, gender: str = "female", voice_id: Optional[str
             # fall through to Edge
 
     # Fallback to Edge TTS
-    audio_bytes = await _edge_tts_async(text, gender)
+    with stage("tts_edge"):
+        audio_bytes = await _edge_tts_async(text, gender)
     _cache_set(key, audio_bytes)
     return audio_bytes
 
@@ -328,6 +351,21 @@ async def tts_bytes(text: str, gender: str = "female") -> bytes:
 # -----------------------------
 # API endpoint
 # -----------------------------
+@router.on_event("startup")
+def _start_cache_sweeper():
+    _TTS_CACHE.start()
+
+
+@router.on_event("shutdown")
+def _stop_cache_sweeper():
+    _TTS_CACHE.stop()
+
+
+@router.get("/tts/stats")
+def tts_stats():
+    return {"cache": _TTS_CACHE.stats(), "singleflight": _TTS_FLIGHT.stats()}
+
+
 @router.post("/tts")
 async def tts_endpoint(req: TTSRequest):
     """
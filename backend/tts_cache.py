@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Synthesized audio by cache key, bounded by total bytes rather than entry
+# count (clip sizes vary a lot with text length). Least recently used clips
+# are evicted first once max_bytes is exceeded, entries expire after ttl
+# seconds, and a daemon thread sweeps expired entries every sweep_interval
+# seconds so keys that are never read again do not stay resident.
+
+
+class TTSCache:
+    def __init__(self, max_bytes: int, ttl: float, sweep_interval: float = 60.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires, audio)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejected = 0  # single clips larger than max_bytes
+        self.evictions = {"lru": 0, "expired": 0}
+
+    def _remove(self, key: str, reason: str) -> None:
+        _, audio = self._entries.pop(key)
+        self.bytes -= len(audio)
+        self.evictions[reason] += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] <= time.time():
+                self._remove(key, "expired")
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, audio: bytes) -> None:
+        if len(audio) > self.max_bytes:
+            with self._lock:
+                self.rejected += 1
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old[1])
+            self._entries[key] = (time.time() + self.ttl, audio)
+            self.bytes += len(audio)
+            self.stores += 1
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)), "lru")
+
+    def sweep(self) -> int:
+        """
+        Drop every expired entry; returns how many were dropped.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires, _) in self._entries.items() if expires <= now]
+            for key in expired:
+                self._remove(key, "expired")
+        return len(expired)
+
+    def start(self) -> None:
+        if self.sweep_interval > 0 and self._thread is None:
+            self._stop = threading.Event()  # a stopped sweeper may still be waking up
+            self._thread = threading.Thread(target=self._loop, name="tts-cache-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _loop(self) -> None:
+        stop = self._stop
+        while not stop.wait(self.sweep_interval):
+            try:
+                dropped = self.sweep()
+            except Exception as e:
+                print(f"[TTS CACHE] sweep failed: {e}")
+                continue
+            if dropped:
+                print(f"[TTS CACHE] swept {dropped} expired clips, {self.bytes} bytes resident")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "rejected": self.rejected,
+                "evictions": dict(self.evictions),
+            }
@@ -0,0 +1,147 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Energy + zero-crossing voice activity detection, vectorised over frames.
+#   - a frame is speech if its energy clears an adaptive threshold (noise
+#     floor + margin), or a lower one when its zero-crossing rate looks like
+#     an unvoiced consonant ("s", "f", "th")
+#   - speech regions are padded on both sides, so onsets/offsets survive and
+#     pauses inside an utterance collapse to at most 2 * pad
+#   - everything outside the padded regions is dropped
+
+FRAME_MS = 20
+
+
+def _frames(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    n = len(samples) // frame_len
+    return samples[: n * frame_len].reshape(n, frame_len)
+
+
+def _features(frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # (energy in dB, zero-crossing rate) per frame
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    return energy_db, np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+
+def speech_mask(
+    samples: np.ndarray,
+    sample_rate: int,
+    margin_db: float = 12.0,
+    min_db: float = -50.0,
+    zcr_range: Tuple[float, float] = (0.15, 0.5),
+) -> np.ndarray:
+    """
+    One bool per FRAME_MS frame.
+    """
+    frames = _frames(samples, max(1, sample_rate * FRAME_MS // 1000))
+    if len(frames) == 0:
+        return np.zeros(0, dtype=bool)
+    energy_db, zcr = _features(frames)
+
+    # Clips with no pause have their floor at speech level, hence the cap
+    # relative to the loudest frame. Steady background noise louder than
+    # min_db is kept rather than risk cutting speech.
+    floor = np.percentile(energy_db, 10)
+    threshold = max(min(floor + margin_db, energy_db.max() - margin_db), min_db)
+    voiced = energy_db >= threshold
+    unvoiced = (energy_db >= threshold - margin_db / 2) & (zcr >= zcr_range[0]) & (zcr <= zcr_range[1])
+    return voiced | unvoiced
+
+
+def _dilate(mask: np.ndarray, pad: int) -> np.ndarray:
+    if pad <= 0 or not mask.any():
+        return mask
+    kernel = np.ones(2 * pad + 1, dtype=np.int32)
+    return np.convolve(mask.astype(np.int32), kernel, mode="same") > 0
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    # [start, end) frame indexes of each True run
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def trim_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    pad_ms: int = 200,
+    min_speech_ms: int = 250,
+    margin_db: float = 12.0,
+    min_db: float = -50.0,
+) -> Tuple[np.ndarray, Dict]:
+    """
+    Returns (speech-only samples, report). The samples are empty when the
+    clip holds less than min_speech_ms of speech.
+    """
+    frame_len = max(1, sample_rate * FRAME_MS // 1000)
+    input_seconds = len(samples) / sample_rate if sample_rate else 0.0
+    mask = speech_mask(samples, sample_rate, margin_db=margin_db, min_db=min_db)
+
+    report = {
+        "input_seconds": input_seconds,
+        "speech_seconds": float(mask.sum()) * FRAME_MS / 1000.0,
+        "kept_seconds": 0.0,
+        "trimmed_seconds": input_seconds,
+        "segments": 0,
+        "empty": True,
+    }
+    if report["speech_seconds"] * 1000.0 < min_speech_ms:
+        return samples[:0], report
+
+    runs = _runs(_dilate(mask, pad_ms // FRAME_MS))
+    # The tail that does not fill a whole frame follows the last frame
+    last = len(mask)
+    pieces = [samples[s * frame_len:(len(samples) if e == last else e * frame_len)] for s, e in runs]
+    kept = np.concatenate(pieces)
+
+    report.update({
+        "kept_seconds": len(kept) / sample_rate,
+        "trimmed_seconds": input_seconds - len(kept) / sample_rate,
+        "segments": len(runs),
+        "empty": False,
+    })
+    return kept, report
+
+
+class StreamingVAD:
+    """
+    speech_mask for audio that arrives in chunks. There is no whole clip to
+    take a percentile over, so the noise floor is tracked instead: it drops
+    to a quieter frame at once and rises slowly (about 1 dB/s), so speech
+    does not drag it up.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        margin_db: float = 12.0,
+        min_db: float = -50.0,
+        zcr_range: Tuple[float, float] = (0.15, 0.5),
+        floor_rise_db_per_s: float = 1.0,
+    ):
+        self.frame_len = max(1, sample_rate * FRAME_MS // 1000)
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.zcr_range = zcr_range
+        self.floor_rise = floor_rise_db_per_s * FRAME_MS / 1000.0
+        self.floor_db = None
+
+    def process(self, frames: np.ndarray) -> np.ndarray:
+        """
+        frames: (n, frame_len) float32. One bool per frame.
+        """
+        if len(frames) == 0:
+            return np.zeros(0, dtype=bool)
+        energy_db, zcr = _features(frames)
+        mask = np.empty(len(frames), dtype=bool)
+        floor = energy_db[0] if self.floor_db is None else self.floor_db
+        for i, (e, z) in enumerate(zip(energy_db, zcr)):
+            floor = e if e < floor else floor + self.floor_rise
+            threshold = max(floor + self.margin_db, self.min_db)
+            mask[i] = e >= threshold or (
+                e >= threshold - self.margin_db / 2 and self.zcr_range[0] <= z <= self.zcr_range[1]
+            )
+        self.floor_db = floor
+        return mask
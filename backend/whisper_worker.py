@@ -0,0 +1,33 @@
+import io
+import os
+import time
+
+# Runs inside the local STT worker processes (see LocalWhisperProvider).
+# Kept free of FastAPI/Groq imports so spawned workers start quickly;
+# faster-whisper is only needed when STT_ENGINE=local.
+
+_model = None
+
+
+def init(model_size: str, device: str, compute_type: str, cpu_threads: int) -> None:
+    global _model
+    from faster_whisper import WhisperModel
+
+    _model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+    print(f"[LOCAL STT] worker {os.getpid()} loaded {model_size} ({device}, {compute_type})")
+
+
+def ping() -> int:
+    # Forces the pool to start a worker (and load its model) ahead of traffic
+    time.sleep(0.05)
+    return os.getpid()
+
+
+def transcribe(audio: bytes, language: str, beam_size: int):
+    """
+    Returns (text, audio seconds, processing seconds).
+    """
+    start = time.perf_counter()
+    segments, info = _model.transcribe(io.BytesIO(audio), language=language, beam_size=beam_size)
+    text = " ".join(segment.text.strip() for segment in segments)  # segments are lazy
+    return text.strip(), info.duration, time.perf_counter() - start
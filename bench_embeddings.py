@@ -0,0 +1,55 @@
+"""
+Embedding throughput vs concurrency: one encoder call per request versus the
+MicroBatcher used by ai_backend.rag.
+
+    python bench_embeddings.py --requests 512 --concurrency 1 4 16 64
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_community.embeddings import SentenceTransformerEmbeddings
+from ai_backend.embedding_service import EmbeddingService, MicroBatcher
+
+
+def run(service: EmbeddingService, texts, concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(service.embed_query, texts))
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("EMBED_BATCH_SIZE", "32")))
+    parser.add_argument("--wait-ms", type=float, default=float(os.getenv("EMBED_BATCH_WAIT_MS", "5")))
+    args = parser.parse_args()
+
+    model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
+    model.embed_documents(["warm up"])
+
+    batcher = MicroBatcher(model.embed_documents, max_batch_size=args.batch_size, max_wait_ms=args.wait_ms)
+    # max_entries=0 disables the cache so every request reaches the encoder
+    direct = EmbeddingService(model, max_entries=0)
+    batched = EmbeddingService(model, max_entries=0, batcher=batcher)
+
+    print(f"{'concurrency':>11} {'direct req/s':>13} {'batched req/s':>14} {'speedup':>8} {'avg batch':>10}")
+    for c in args.concurrency:
+        # unique texts per run so nothing is shared between modes
+        texts = [f"message {c}-{i}: how are you feeling today?" for i in range(args.requests)]
+        direct_rps = run(direct, texts, c)
+        before = (batcher.batches, batcher.texts)
+        batched_rps = run(batched, [t + " " for t in texts], c)
+        batches = batcher.batches - before[0]
+        avg = (batcher.texts - before[1]) / batches if batches else 0.0
+        print(f"{c:>11} {direct_rps:>13.1f} {batched_rps:>14.1f} {batched_rps / direct_rps:>7.2f}x {avg:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
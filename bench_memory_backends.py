@@ -0,0 +1,76 @@
+"""
+Memory search latency: Chroma (global collection + user_id filter) versus the
+per-user NumPy memmap backend, on synthetic unit vectors.
+
+    python bench_memory_backends.py --users 50 --per-user 2000 --queries 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_chroma import Chroma
+from ai_backend.memory_store import ChromaMemoryStore, NumpyMemoryStore
+
+
+def percentile(samples, p):
+    return float(np.percentile(np.asarray(samples), p))
+
+
+def bench(name, store, user_ids, queries, k):
+    timings = []
+    for i, q in enumerate(queries):
+        user_id = user_ids[i % len(user_ids)]
+        start = time.perf_counter()
+        store.search(user_id, q, k)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    print(
+        f"{name:>6}: p50 {percentile(timings, 50):7.2f} ms  p95 {percentile(timings, 95):7.2f} ms  "
+        f"p99 {percentile(timings, 99):7.2f} ms  ({len(queries) / (sum(timings) / 1000.0):.0f} q/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--per-user", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--max-resident", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    user_ids = [f"user_{u}" for u in range(args.users)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chroma = ChromaMemoryStore(Chroma(collection_name="bench", persist_directory=os.path.join(tmp, "chroma")))
+        numpy_store = NumpyMemoryStore(os.path.join(tmp, "numpy"), dim=args.dim, max_resident=args.max_resident)
+
+        print(f"loading {args.users} users x {args.per_user} memories ...")
+        for user_id in user_ids:
+            vectors = rng.normal(size=(args.per_user, args.dim)).astype(np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            records = [
+                {"text": f"{user_id} memory {i}", "metadata": {"user_id": user_id}, "embedding": v.tolist()}
+                for i, v in enumerate(vectors)
+            ]
+            # Chroma caps a single add at its max batch size
+            for start in range(0, len(records), 1000):
+                chroma.add(records[start:start + 1000])
+            numpy_store.add(records)
+
+        queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        bench("chroma", chroma, user_ids, queries, args.k)
+        bench("numpy", numpy_store, user_ids, queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+End-to-end latency benchmark for /speech-chat, /llm-response and /tts.
+
+In-process (default) the app runs against the offline fake providers
+(backend/fake_providers.py), so no Groq/Gemini/ElevenLabs quota is used:
+
+    python bench_speech_chat.py --requests 200 --concurrency 16
+    FAKE_LLM_MEDIAN_MS=1200 FAKE_LLM_ERROR_RATE=0.05 python bench_speech_chat.py
+
+Against a running server (whatever providers it is configured with):
+
+    python bench_speech_chat.py --url http://localhost:8000 --endpoints tts
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+ENDPOINTS = ("speech-chat", "llm-response", "tts")
+
+TEXTS = [
+    "hi, how are you doing today",
+    "tell me a joke",
+    "i had a really long day at work",
+    "what should i cook for dinner tonight",
+]
+
+
+def percentile(samples, p):
+    return float(np.percentile(np.asarray(samples), p)) if samples else float("nan")
+
+
+def speech_wav(seconds: float, variant: int) -> bytes:
+    # Syllable-like tone bursts with pauses, so the VAD keeps the clip
+    # (an all-zero clip is trimmed to nothing and /speech-chat returns 422).
+    # Pitch varies per request so single-flight/caches do not hide latency.
+    rate = 16000
+    t = np.arange(int(rate * seconds)) / rate
+    pitch = 120.0 + (variant % 97) * 2.0
+    envelope = (np.sin(2 * np.pi * 3.0 * t) > -0.3).astype(np.float32)
+    samples = 0.3 * envelope * np.sin(2 * np.pi * pitch * t)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((samples * 32767).astype(np.int16).tobytes())
+    return buf.getvalue()
+
+
+def server_timing(header: str) -> dict:
+    # "stt;dur=12.3, reply;dur=800.1, total;dur=950.0" -> {"stt": 12.3, ...}, summed per stage
+    timings = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        if not name or name == "total" or not params.startswith("dur="):
+            continue
+        timings[name] = timings.get(name, 0.0) + float(params[4:])
+    return timings
+
+
+def build_app():
+    os.environ.setdefault("FAKE_PROVIDERS", "all")
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+    from fastapi import FastAPI
+    from backend.metrics import ServerTimingMiddleware
+    from backend.stt import router as stt_router
+    from backend.tts import router as tts_router
+    from ai_backend.speech_chat import router as speech_chat_router
+    from ai_backend.rag import router as rag_router
+
+    # Only the routers under test (main.py also opens the camera)
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+    for router in (stt_router, tts_router, speech_chat_router, rag_router):
+        app.include_router(router)
+    return app
+
+
+async def one_request(client, endpoint, i, args):
+    text = f"{TEXTS[i % len(TEXTS)]} ({i})"
+    if endpoint == "speech-chat":
+        return await client.post(
+            "/speech-chat",
+            files={"file": ("clip.wav", speech_wav(args.audio_seconds, i), "audio/wav")},
+            data={"user_id": f"bench_{i % args.users}", "role": "assistant"},
+        )
+    if endpoint == "llm-response":
+        return await client.post(
+            "/llm-response",
+            json={"user_text": text, "user_id": f"bench_{i % args.users}", "role": "assistant"},
+        )
+    return await client.post("/tts", json={"text": text, "gender": "female"})
+
+
+async def run_endpoint(client, endpoint, args):
+    latencies, stages, errors = [], {}, {}
+    next_index = iter(range(args.requests))
+
+    async def worker():
+        for i in next_index:
+            start = time.perf_counter()
+            try:
+                resp = await one_request(client, endpoint, i, args)
+                status = resp.status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - start) * 1000.0
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+                continue
+            latencies.append(elapsed)
+            for stage, ms in server_timing(resp.headers.get("server-timing", "")).items():
+                stages.setdefault(stage, []).append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - started
+
+    print(f"\n/{endpoint}: {args.requests} requests, concurrency {args.concurrency}, {wall:.2f}s")
+    rows = [(stage, samples) for stage, samples in stages.items()] + [("overall", latencies)]
+    for name, samples in rows:
+        print(
+            f"  {name:>8}: p50 {percentile(samples, 50):8.1f} ms  p95 {percentile(samples, 95):8.1f} ms  "
+            f"p99 {percentile(samples, 99):8.1f} ms"
+        )
+    print(f"  throughput {len(latencies) / wall:.1f} req/s, errors {errors or 0}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--audio-seconds", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    endpoints = [e.strip().lstrip("/") for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        transport = httpx.ASGITransport(app=build_app())
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout)
+
+    async with client:
+        for endpoint in endpoints:
+            await run_endpoint(client, endpoint, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+STT engine latency: Groq (pooled clients) versus local faster-whisper workers.
+
+    python bench_stt.py --engines groq,local --audio sample.wav --requests 50 --concurrency 4
+    STT_LOCAL_MODEL=small STT_LOCAL_WORKERS=4 python bench_stt.py --engines local
+
+Without --audio a synthetic 5 s tone is used (fine for latency, not accuracy).
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from backend.stt_providers import LocalWhisperProvider, provider_from_env
+
+
+def percentile(samples, p):
+    return float(np.percentile(np.asarray(samples), p)) if samples else float("nan")
+
+
+def synthetic_wav(seconds: float = 5.0) -> bytes:
+    t = np.arange(int(16000 * seconds)) / 16000.0
+    tone = (0.2 * np.sin(2 * np.pi * 220.0 * t) * 32767).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(tone.tobytes())
+    return buf.getvalue()
+
+
+async def bench(engine, clips, args):
+    provider = provider_from_env(engine)
+    if isinstance(provider, LocalWhisperProvider):
+        started = time.perf_counter()
+        await provider.warm()
+        print(f"{engine}: workers warm in {time.perf_counter() - started:.1f}s")
+
+    latencies, errors = [], {}
+    next_index = iter(range(args.requests))
+
+    async def worker():
+        for i in next_index:
+            name, audio = clips[i % len(clips)]
+            start = time.perf_counter()
+            try:
+                await provider.transcribe(name, io.BytesIO(audio), args.model)
+            except Exception as e:  # overload / deadline / provider errors
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    wall = time.perf_counter() - started
+    await provider.aclose()
+
+    print(
+        f"{engine:>6}: p50 {percentile(latencies, 50):8.1f} ms  p95 {percentile(latencies, 95):8.1f} ms  "
+        f"p99 {percentile(latencies, 99):8.1f} ms  {len(latencies) / wall:.2f} clips/s  errors {errors or 0}"
+    )
+    print(f"        {provider.stats()}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engines", default="groq,local")
+    parser.add_argument("--audio", nargs="*", default=[])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--model", default="whisper-large-v3", help="Groq model (local uses STT_LOCAL_MODEL)")
+    args = parser.parse_args()
+
+    clips = []
+    for path in args.audio:
+        with open(path, "rb") as f:
+            clips.append((os.path.basename(path), f.read()))
+    if not clips:
+        clips = [("tone.wav", synthetic_wav())]
+
+    for engine in (e.strip() for e in args.engines.split(",") if e.strip()):
+        await bench(engine, clips, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())